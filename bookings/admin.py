@@ -3,7 +3,16 @@ from django import forms
 from django.contrib import messages
 from django.utils.translation import ngettext
 from django.contrib.admin import RelatedFieldListFilter, SimpleListFilter
-from .models import Booking, BookingHistory, Review
+from .models import (
+    Booking,
+    BookingArchive,
+    BookingHistory,
+    BookingHistoryArchive,
+    OutboxMessage,
+    Review,
+    WaitlistEntry,
+)
+from . import sweeps
 from users.models import User
 from services.models import ServiceCategory
 
@@ -48,6 +57,21 @@ class ReviewStaffFilter(SimpleListFilter):
         return queryset
 
 
+class UnresolvedFilter(SimpleListFilter):
+    """Прошедшие подтверждённые записи, по которым не отмечен визит"""
+
+    title = "Ожидает отметки"
+    parameter_name = "unresolved"
+
+    def lookups(self, request, model_admin):
+        return [("1", "Да")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "1":
+            return queryset.filter(pk__in=sweeps.unresolved_past().values("pk"))
+        return queryset
+
+
 class CategoryFilter(SimpleListFilter):
     """Фильтр по категориям услуг"""
 
@@ -93,7 +117,7 @@ class BookingAdmin(admin.ModelAdmin):
         "appointment_date",
         "appointment_time",
     )  # Разрешаем редактирование status прямо в списке
-    list_filter = ("status", "appointment_date", StaffFilter, CategoryFilter)
+    list_filter = ("status", UnresolvedFilter, "appointment_date", StaffFilter, CategoryFilter)
     search_fields = (
         "client__username",
         "client__first_name",
@@ -140,12 +164,25 @@ class BookingAdmin(admin.ModelAdmin):
 
     total_price_display.short_description = "Цена"
 
-    # Actions для массового изменения статуса
+    # Actions для массового изменения статуса (один UPDATE на пачку записей)
+    def apply_transition(self, request, queryset, status):
+        """Сменить статус и предупредить о записях с недопустимым переходом"""
+        updated, skipped = Booking.objects.transition(queryset, status, user=request.user)
+        if skipped:
+            self.message_user(
+                request,
+                ngettext(
+                    "%(count)d запись пропущена: переход в статус «%(status)s» для неё недопустим.",
+                    "%(count)d записей пропущено: переход в статус «%(status)s» для них недопустим.",
+                    skipped,
+                )
+                % {"count": skipped, "status": Booking.Status(status).label},
+                messages.WARNING,
+            )
+        return updated
+
     def mark_as_confirmed(self, request, queryset):
-        for booking in queryset:
-            booking.status = "confirmed"
-            booking.save(user=request.user)  # Передаем пользователя
-        updated = queryset.count()
+        updated = self.apply_transition(request, queryset, Booking.Status.CONFIRMED)
         self.message_user(
             request,
             ngettext(
@@ -159,10 +196,7 @@ class BookingAdmin(admin.ModelAdmin):
     mark_as_confirmed.short_description = "Отметить выбранные записи как подтвержденные"
 
     def mark_as_completed(self, request, queryset):
-        for booking in queryset:
-            booking.status = "completed"
-            booking.save(user=request.user)
-        updated = queryset.count()
+        updated = self.apply_transition(request, queryset, Booking.Status.COMPLETED)
         self.message_user(
             request,
             ngettext(
@@ -176,10 +210,7 @@ class BookingAdmin(admin.ModelAdmin):
     mark_as_completed.short_description = "Отметить выбранные записи как завершенные"
 
     def mark_as_cancelled(self, request, queryset):
-        for booking in queryset:
-            booking.status = "cancelled"
-            booking.save(user=request.user)
-        updated = queryset.count()
+        updated = self.apply_transition(request, queryset, Booking.Status.CANCELLED)
         self.message_user(
             request,
             ngettext(
@@ -193,10 +224,7 @@ class BookingAdmin(admin.ModelAdmin):
     mark_as_cancelled.short_description = "Отметить выбранные записи как отмененные"
 
     def mark_as_no_show(self, request, queryset):
-        for booking in queryset:
-            booking.status = "no_show"
-            booking.save(user=request.user)
-        updated = queryset.count()
+        updated = self.apply_transition(request, queryset, Booking.Status.NO_SHOW)
         self.message_user(
             request,
             ngettext(
@@ -223,6 +251,56 @@ class BookingHistoryAdmin(admin.ModelAdmin):
     readonly_fields = ("created_at",)
 
 
+class BookingHistoryArchiveInline(admin.TabularInline):
+    model = BookingHistoryArchive
+    fields = ("action", "user", "notes", "created_at")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BookingArchive)
+class BookingArchiveAdmin(admin.ModelAdmin):
+    """Архив записей только для просмотра (см. manage.py archive_bookings)"""
+
+    list_display = ("client", "staff", "service", "appointment_date", "appointment_time", "status")
+    list_filter = ("status", "appointment_date")
+    search_fields = ("client__username", "client__first_name", "client__last_name", "notes")
+    date_hierarchy = "appointment_date"
+    list_select_related = ("client", "staff", "service")
+    inlines = [BookingHistoryArchiveInline]
+
+    def get_readonly_fields(self, request, obj=None):
+        return [field.name for field in self.model._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("recipient", "subject", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status", "event", "created_at")
+    search_fields = ("recipient", "subject")
+    raw_id_fields = ("booking",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ("client", "service", "staff", "date_from", "date_to", "status", "created_at")
+    list_filter = ("status", "category")
+    search_fields = ("client__username", "client__first_name", "client__last_name")
+    list_select_related = ("client", "service", "staff")
+    readonly_fields = ("offered_date", "offered_time", "offered_staff", "offered_at", "created_at")
+
+
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
     list_display = (
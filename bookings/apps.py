@@ -5,3 +5,7 @@ class BookingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bookings'
     verbose_name = 'Бронирования'
+
+    def ready(self):
+        # Лист ожидания реагирует на отмену записей
+        from . import waitlist  # noqa: F401
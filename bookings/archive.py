@@ -0,0 +1,85 @@
+"""Архив давних записей.
+
+Завершённые, отменённые и пропущенные записи старше ARCHIVE_AFTER_DAYS
+переносятся вместе с историей и отзывом в таблицы BookingArchive и
+BookingHistoryArchive (manage.py archive_bookings), чтобы рабочие таблицы
+оставались небольшими. Клиентская страница и админка читают архив
+только по запросу через функции этого модуля.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Booking, BookingArchive, BookingHistory, BookingHistoryArchive, Review
+
+
+ARCHIVE_AFTER_DAYS = getattr(settings, "BOOKING_ARCHIVE_AFTER_DAYS", 365)
+CHUNK_SIZE = 500
+
+# В архив попадают только записи, по которым визит уже отмечен
+FINAL_STATUSES = [Booking.Status.COMPLETED, Booking.Status.CANCELLED, Booking.Status.NO_SHOW]
+
+BOOKING_FIELDS = (
+    "id", "client_id", "staff_id", "service_id", "appointment_date", "appointment_time",
+    "end_time", "status", "notes", "created_at", "updated_at",
+)
+HISTORY_FIELDS = ("id", "booking_id", "action", "user_id", "notes", "created_at")
+
+
+def archivable(cutoff=None):
+    """Записи, которые можно перенести в архив"""
+    if cutoff is None:
+        cutoff = timezone.localdate() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    return Booking.objects.filter(appointment_date__lt=cutoff, status__in=FINAL_STATUSES)
+
+
+def archive_chunk(pks):
+    """Перенести записи pks с историей и отзывами в архив одной транзакцией"""
+    with transaction.atomic():
+        reviews = {
+            row["booking_id"]: row
+            for row in Review.objects.filter(booking_id__in=pks).values(
+                "booking_id", "rating", "comment", "created_at"
+            )
+        }
+        bookings = []
+        for row in Booking.objects.filter(pk__in=pks).values(*BOOKING_FIELDS):
+            review = reviews.get(row["id"], {})
+            bookings.append(
+                BookingArchive(
+                    **row,
+                    review_rating=review.get("rating"),
+                    review_comment=review.get("comment", ""),
+                    review_created_at=review.get("created_at"),
+                )
+            )
+        BookingArchive.objects.bulk_create(bookings, batch_size=CHUNK_SIZE)
+        BookingHistoryArchive.objects.bulk_create(
+            [
+                BookingHistoryArchive(**row)
+                for row in BookingHistory.objects.filter(booking_id__in=pks).values(*HISTORY_FIELDS)
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        # Удаление каскадом убирает историю и отзыв, ссылки из очереди писем обнуляются
+        Booking.objects.filter(pk__in=pks).delete()
+    return len(bookings)
+
+
+def archive(cutoff=None, chunk_size=CHUNK_SIZE):
+    """Перенести в архив все подходящие записи пачками. Возвращает их число"""
+    queryset = archivable(cutoff)
+    total = 0
+    while True:
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:chunk_size])
+        if not pks:
+            return total
+        total += archive_chunk(pks)
+
+
+def client_bookings(client):
+    """Архивные записи клиента в том же виде, что и действующие"""
+    return BookingArchive.objects.filter(client=client).select_related("service", "staff")
+
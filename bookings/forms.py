@@ -1,38 +1,103 @@
 from django import forms
-from .models import Booking, Review
-from schedule.models import WorkingHours, SpecialHours
+from .models import Booking, Review, WaitlistEntry
+from schedule import availability
+from . import idempotency
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, timedelta
-from services.models import ServiceCategory
-
-
-class BookingForm(forms.ModelForm):
-    # Фиксированные временные слоты
-    TIME_CHOICES = [
-        ("09:00", "09:00"),
-        ("10:00", "10:00"),
-        ("11:00", "11:00"),
-        ("12:00", "12:00"),
-        ("13:00", "13:00"),
-        ("14:00", "14:00"),
-        ("15:00", "15:00"),
-        ("16:00", "16:00"),
-        ("17:00", "17:00"),
-        ("18:00", "18:00"),
-    ]
-
-    category = forms.ModelChoiceField(
-        queryset=ServiceCategory.objects.all(),
+from services import catalog
+from services.models import Service, ServiceCategory
+from users.models import User
+
+
+SLOT_ERROR_MESSAGES = {
+    "invalid_choice": "Это время недоступно, выберите другое из списка",
+}
+
+
+class CatalogChoiceField(forms.ModelChoiceField):
+    """Выбор объекта из каталога в памяти (services.catalog) без запросов к БД.
+
+    Варианты задаются через set_objects(); queryset используется только
+    для описания поля.
+    """
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.objects = {}
+
+    def set_objects(self, objects):
+        objects = list(objects)
+        self.objects = {obj.pk: obj for obj in objects}
+        choices = [(obj.pk, self.label_from_instance(obj)) for obj in objects]
+        if self.empty_label is not None:
+            choices.insert(0, ("", self.empty_label))
+        self.choices = choices
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return self.objects[int(getattr(value, "pk", value))]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice"
+            )
+
+    def prepare_value(self, value):
+        return getattr(value, "pk", value)
+
+
+def staff_label(user):
+    """В списке мастеров показываем только имя"""
+    return user.first_name or user.username
+
+
+class SlotChoicesMixin:
+    """Варианты времени строятся по расписанию мастера и длительности услуги"""
+
+    def set_slot_choices(self, duration_minutes):
+        field = self.fields["appointment_time"]
+        staff = self.data.get("staff") or self.initial.get("staff")
+        staff_id = getattr(staff, "pk", staff)
+        try:
+            day = self.fields["appointment_date"].to_python(
+                self.data.get("appointment_date") or self.initial.get("appointment_date")
+            )
+            staff_id = int(staff_id) if staff_id else None
+        except (ValidationError, ValueError, TypeError):
+            day = None
+
+        if not (staff_id and day and duration_minutes):
+            field.choices = [("", "Сначала выберите услугу, мастера и дату")]
+            return
+
+        choices = availability.slot_choices(staff_id, day, duration_minutes)
+        field.choices = [("", "Выберите время" if choices else "Нет свободного времени")] + choices
+
+
+class BookingForm(SlotChoicesMixin, forms.ModelForm):
+    category = CatalogChoiceField(
+        queryset=ServiceCategory.objects.none(),
         label="Категория услуги",
         required=False,
         empty_label="Выберите категорию",
     )
+    service = CatalogChoiceField(queryset=Service.objects.none(), label="Услуга")
+    staff = CatalogChoiceField(queryset=User.objects.none(), label="Мастер")
 
     appointment_date = forms.DateField(
         widget=forms.DateInput(attrs={"type": "date"}), label="Дата записи"
     )
-    appointment_time = forms.ChoiceField(choices=TIME_CHOICES, label="Время записи")
+    appointment_time = forms.ChoiceField(
+        choices=[],
+        label="Время записи",
+        error_messages=SLOT_ERROR_MESSAGES,
+    )
+    # Повторная отправка формы с тем же токеном не создаёт вторую запись
+    submission_token = forms.CharField(
+        widget=forms.HiddenInput, required=False, initial=idempotency.issue_token
+    )
 
     class Meta:
         model = Booking
@@ -47,23 +112,18 @@ class BookingForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields["category"].queryset = self.fields["category"].queryset.order_by(
-            "name"
-        )
-        # Сортируем услуги по названию
-        self.fields["service"].queryset = self.fields["service"].queryset.order_by(
-            "name"
-        )
-
-        # Настраиваем отображение мастеров - только имя
-        self.fields["staff"].label_from_instance = (
-            lambda obj: obj.first_name or obj.username
-        )
-
-        # Сортируем мастеров по имени пользователя
-        self.fields["staff"].queryset = (
-            self.fields["staff"].queryset.filter(role="staff").order_by("first_name")
-        )
+        # Категории, услуги и мастера - из каталога в памяти, без запросов к БД
+        snapshot = catalog.snapshot()
+        self.fields["category"].set_objects(snapshot.categories)
+        self.fields["service"].set_objects(snapshot.services)
+        self.fields["staff"].label_from_instance = staff_label
+        self.fields["staff"].set_objects(snapshot.staff)
+
+        # Время записи - только реально свободные слоты выбранного мастера
+        service = self.data.get("service") or self.initial.get("service")
+        service = snapshot.service(getattr(service, "pk", service), active_only=False)
+        duration = service.duration_minutes if service else None
+        self.set_slot_choices(duration)
 
     def clean(self):
         """Валидация доступности времени"""
@@ -130,65 +190,25 @@ class BookingForm(forms.ModelForm):
 
     def is_staff_available(self, staff, date, time, duration_minutes):
         """Проверка доступности мастера в указанное время"""
-        # Проверка специальных часов (праздники, выходные)
-        special_hours = SpecialHours.objects.filter(staff=staff, date=date).first()
-        if special_hours:
-            if special_hours.start_time is None:  # Выходной
-                return False
-            if not (special_hours.start_time <= time <= special_hours.end_time):
-                return False
-        else:
-            # Проверка обычных рабочих часов
-            day_of_week = date.weekday()
-            working_hours = WorkingHours.objects.filter(
-                staff=staff, day_of_week=day_of_week, is_active=True
-            ).first()
-
-            if not working_hours:
-                return False
-
-            if not (working_hours.start_time <= time <= working_hours.end_time):
-                return False
-
-        # Проверка конфликтов с существующими записями
-        end_time = (
-            datetime.combine(date, time) + timedelta(minutes=duration_minutes)
-        ).time()
-
-        conflicts = (
-            Booking.objects.filter(
-                staff=staff,
-                appointment_date=date,
-                appointment_time__lt=end_time,
-                appointment_time__gte=time,
-            )
-            .exclude(status="cancelled")
-            .exists()
-        )
+        return availability.is_staff_available(staff, date, time, duration_minutes)
 
-        return not conflicts
 
-
-class ServiceBookingForm(forms.ModelForm):
+class ServiceBookingForm(SlotChoicesMixin, forms.ModelForm):
     """Форма бронирования для детальной страницы услуги (без поля service)"""
 
-    TIME_CHOICES = [
-        ("09:00", "09:00"),
-        ("10:00", "10:00"),
-        ("11:00", "11:00"),
-        ("12:00", "12:00"),
-        ("13:00", "13:00"),
-        ("14:00", "14:00"),
-        ("15:00", "15:00"),
-        ("16:00", "16:00"),
-        ("17:00", "17:00"),
-        ("18:00", "18:00"),
-    ]
-
+    staff = CatalogChoiceField(queryset=User.objects.none(), label="Мастер", empty_label=None)
     appointment_date = forms.DateField(
         widget=forms.DateInput(attrs={"type": "date"}), label="Дата записи"
     )
-    appointment_time = forms.ChoiceField(choices=TIME_CHOICES, label="Время записи")
+    appointment_time = forms.ChoiceField(
+        choices=[],
+        label="Время записи",
+        error_messages=SLOT_ERROR_MESSAGES,
+    )
+    # Повторная отправка формы с тем же токеном не создаёт вторую запись
+    submission_token = forms.CharField(
+        widget=forms.HiddenInput, required=False, initial=idempotency.issue_token
+    )
 
     class Meta:
         model = Booking
@@ -198,45 +218,24 @@ class ServiceBookingForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # Убираем пустой choice из поля staff
-        self.fields["staff"].empty_label = None
-
-        # Настраиваем отображение мастеров - только имя
-        self.fields["staff"].label_from_instance = (
-            lambda obj: obj.first_name or obj.username
-        )
-
-        # Фильтруем мастеров по специализации выбранной услуги
+        # Услуга и мастера - из каталога в памяти, без запросов к БД
+        snapshot = catalog.snapshot()
         selected_service = self.initial.get("service") or self.data.get("service")
-        if selected_service:
-            try:
-                from services.models import Service
-
-                # Если selected_service - это объект Service, берем его ID
-                if hasattr(selected_service, "pk"):
-                    service_id = selected_service.pk
-                else:
-                    service_id = selected_service
-
-                service = Service.objects.get(pk=service_id)
-                # Показываем только мастеров, специализирующихся на категории этой услуги
-                self.fields["staff"].queryset = (
-                    self.fields["staff"]
-                    .queryset.filter(role="staff", specialization=service.category)
-                    .order_by("username")
-                )
-            except (Service.DoesNotExist, ValueError, AttributeError):
-                # Если услуга не найдена, показываем всех мастеров
-                self.fields["staff"].queryset = (
-                    self.fields["staff"]
-                    .queryset.filter(role="staff")
-                    .order_by("username")
-                )
+        self.service = snapshot.service(
+            getattr(selected_service, "pk", selected_service), active_only=False
+        )
+        if self.service:
+            # Показываем только мастеров, специализирующихся на категории этой услуги
+            staff = snapshot.staff_for(self.service.category_id)
         else:
-            # Если услуга не выбрана, показываем всех мастеров
-            self.fields["staff"].queryset = (
-                self.fields["staff"].queryset.filter(role="staff").order_by("username")
-            )
+            # Если услуга не найдена или не выбрана, показываем всех мастеров
+            staff = snapshot.staff_for()
+        self.fields["staff"].label_from_instance = staff_label
+        self.fields["staff"].set_objects(sorted(staff, key=lambda user: user.username))
+        duration = self.service.duration_minutes if self.service else None
+
+        # Время записи - только реально свободные слоты выбранного мастера
+        self.set_slot_choices(duration)
 
     def _post_clean(self):
         """Пропускаем валидацию модели, так как client устанавливается в представлении"""
@@ -281,74 +280,29 @@ class ServiceBookingForm(forms.ModelForm):
             return cleaned_data
 
         # Для ServiceBookingForm услуга берется из initial или передается отдельно
-        selected_service = self.initial.get("service") or self.data.get("service")
-        if selected_service:
-            try:
-                from services.models import Service
-
-                if hasattr(selected_service, "pk"):
-                    service_id = selected_service.pk
-                else:
-                    service_id = selected_service
-                service = Service.objects.get(pk=service_id)
+        if self.initial.get("service") or self.data.get("service"):
+            if self.service is None:
+                raise ValidationError("Выбранная услуга не найдена")
 
-                # Конвертируем время в time объект
-                if isinstance(appointment_time, str):
-                    time_obj = datetime.strptime(appointment_time, "%H:%M").time()
-                else:
-                    time_obj = appointment_time
+            # Конвертируем время в time объект
+            if isinstance(appointment_time, str):
+                time_obj = datetime.strptime(appointment_time, "%H:%M").time()
+            else:
+                time_obj = appointment_time
 
-                # Проверка доступности мастера в указанное время
-                if not self.is_staff_available(
-                    staff, appointment_date, time_obj, service.duration_minutes
-                ):
-                    raise ValidationError(
-                        "Мастер в это время занят или услуга не помещается в расписание"
-                    )
-            except Service.DoesNotExist:
-                raise ValidationError("Выбранная услуга не найдена")
+            # Проверка доступности мастера в указанное время
+            if not self.is_staff_available(
+                staff, appointment_date, time_obj, self.service.duration_minutes
+            ):
+                raise ValidationError(
+                    "Мастер в это время занят или услуга не помещается в расписание"
+                )
 
         return cleaned_data
 
     def is_staff_available(self, staff, date, time, duration_minutes):
         """Проверка доступности мастера в указанное время"""
-        # Проверка специальных часов (праздники, выходные)
-        special_hours = SpecialHours.objects.filter(staff=staff, date=date).first()
-        if special_hours:
-            if special_hours.start_time is None:  # Выходной
-                return False
-            if not (special_hours.start_time <= time <= special_hours.end_time):
-                return False
-        else:
-            # Проверка обычных рабочих часов
-            day_of_week = date.weekday()
-            working_hours = WorkingHours.objects.filter(
-                staff=staff, day_of_week=day_of_week, is_active=True
-            ).first()
-
-            if not working_hours:
-                return False
-
-            if not (working_hours.start_time <= time <= working_hours.end_time):
-                return False
-
-        # Проверка конфликтов с существующими записями
-        end_time = (
-            datetime.combine(date, time) + timedelta(minutes=duration_minutes)
-        ).time()
-
-        conflicts = (
-            Booking.objects.filter(
-                staff=staff,
-                appointment_date=date,
-                appointment_time__lt=end_time,
-                appointment_time__gte=time,
-            )
-            .exclude(status="cancelled")
-            .exists()
-        )
-
-        return not conflicts
+        return availability.is_staff_available(staff, date, time, duration_minutes)
     
 
 class ReviewForm(forms.ModelForm):
@@ -370,3 +324,36 @@ class ReviewForm(forms.ModelForm):
     class Meta:
         model = Review
         fields = ['rating', 'comment']
+
+
+class WaitlistForm(forms.ModelForm):
+    """Заявка в лист ожидания"""
+
+    service = CatalogChoiceField(queryset=Service.objects.none(), label="Услуга")
+    staff = CatalogChoiceField(
+        queryset=User.objects.none(), label="Мастер", required=False,
+        empty_label="Любой мастер", help_text="Пусто - подойдёт любой мастер",
+    )
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ["service", "staff", "date_from", "date_to", "time_from", "time_to"]
+        widgets = {
+            "date_from": forms.DateInput(attrs={"type": "date"}),
+            "date_to": forms.DateInput(attrs={"type": "date"}),
+            "time_from": forms.TimeInput(attrs={"type": "time"}),
+            "time_to": forms.TimeInput(attrs={"type": "time"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        snapshot = catalog.snapshot()
+        self.fields["service"].set_objects(snapshot.active_services())
+        self.fields["staff"].label_from_instance = staff_label
+        self.fields["staff"].set_objects(snapshot.staff)
+
+    def clean_date_from(self):
+        date_from = self.cleaned_data["date_from"]
+        if date_from < timezone.localdate():
+            raise ValidationError("Нельзя встать в очередь на прошедшую дату")
+        return date_from
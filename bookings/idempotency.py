@@ -0,0 +1,140 @@
+"""Идемпотентная отправка формы записи.
+
+Форма выдаётся со скрытым токеном. Первый POST с токеном занимает его
+(в кеше и в таблице BookingSubmission), повторный POST с тем же токеном
+(двойной клик, повтор запроса мобильным браузером) сразу получает
+результат первого - без валидации формы и обращений к таблице записей.
+
+Если обработка завершилась ошибкой, представление освобождает токен
+(release). Если процесс оборвался, не успев этого сделать, занятый токен
+считается брошенным через PENDING_TTL секунд и может быть занят снова.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.shortcuts import redirect
+from django.utils import timezone
+
+from .models import BookingSubmission
+
+
+TOKEN_TTL = getattr(settings, "BOOKING_SUBMISSION_TTL", 24 * 60 * 60)
+
+FIELD_NAME = "submission_token"
+
+# Значение в кеше, пока первый запрос ещё обрабатывается
+PENDING = "pending"
+
+# Дольше обработка формы не длится - после этого токен без результата брошен
+PENDING_TTL = 60
+
+
+def issue_token():
+    return uuid.uuid4().hex
+
+
+def _usable(client_id, token):
+    return bool(client_id and token) and len(token) <= 64
+
+
+def _key(client_id, token):
+    return f"bookings:submission:{client_id}:{token}"
+
+
+class Replay:
+    """Результат ранее обработанного (или обрабатываемого) запроса"""
+
+    def __init__(self, booking_id=None):
+        self.booking_id = booking_id
+
+    @property
+    def pending(self):
+        return self.booking_id is None
+
+
+def claim(client_id, token):
+    """Занять токен для обработки запроса.
+
+    Возвращает None, если запрос нужно обработать, или Replay, если токен
+    уже использован. Запросы без токена всегда обрабатываются.
+    """
+    if not _usable(client_id, token):
+        return None
+    key = _key(client_id, token)
+    if not cache.add(key, PENDING, PENDING_TTL):
+        value = cache.get(key)
+        if value is not None:
+            return Replay(None if value == PENDING else value)
+
+    # Кеш мог быть сброшен или принадлежать другому процессу - решает БД
+    try:
+        with transaction.atomic():
+            BookingSubmission.objects.create(token=token, client_id=client_id)
+    except IntegrityError:
+        submission = (
+            BookingSubmission.objects.filter(token=token, client_id=client_id)
+            .values("booking_id")
+            .first()
+        )
+        if submission is None:
+            # Токен чужого пользователя - обрабатываем как запрос без токена
+            cache.delete(key)
+            return None
+        if submission["booking_id"]:
+            cache.set(key, submission["booking_id"], TOKEN_TTL)
+        elif _take_over(client_id, token):
+            return None
+        return Replay(submission["booking_id"])
+    return None
+
+
+def _take_over(client_id, token):
+    """Занять токен, обработка которого оборвалась больше PENDING_TTL назад"""
+    now = timezone.now()
+    return bool(
+        BookingSubmission.objects.filter(
+            token=token,
+            client_id=client_id,
+            booking__isnull=True,
+            created_at__lt=now - timedelta(seconds=PENDING_TTL),
+        ).update(created_at=now)
+    )
+
+
+def complete(client_id, token, booking):
+    """Запомнить результат обработки токена"""
+    if not _usable(client_id, token):
+        return
+    BookingSubmission.objects.filter(token=token, client_id=client_id).update(booking=booking)
+    cache.set(_key(client_id, token), booking.pk, TOKEN_TTL)
+
+
+def release(client_id, token):
+    """Освободить токен (форма не прошла проверку или обработка упала)"""
+    if not _usable(client_id, token):
+        return
+    BookingSubmission.objects.filter(
+        token=token, client_id=client_id, booking__isnull=True
+    ).delete()
+    cache.delete(_key(client_id, token))
+
+
+def replay_response(request, replay):
+    """Ответ на повторную отправку: тот же переход, что и после первой"""
+    if replay.pending:
+        messages.info(request, "Ваша запись уже обрабатывается")
+    else:
+        messages.info(request, "Запись уже создана")
+    return redirect("bookings:my_bookings")
+
+
+def purge_expired():
+    """Удалить токены старше TOKEN_TTL"""
+    deleted, _ = BookingSubmission.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=TOKEN_TTL)
+    ).delete()
+    return deleted
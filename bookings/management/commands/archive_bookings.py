@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from bookings import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Перенести завершённые записи старше BOOKING_ARCHIVE_AFTER_DAYS дней "
+        "вместе с историей и отзывами в архивные таблицы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=archive.ARCHIVE_AFTER_DAYS,
+            help="Архивировать записи старше стольких дней",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=archive.CHUNK_SIZE,
+            help="Записей в одной транзакции",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localdate() - timedelta(days=options["days"])
+        moved = archive.archive(cutoff, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Перенесено в архив записей до {cutoff}: {moved}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from bookings import idempotency
+
+
+class Command(BaseCommand):
+    help = (
+        "Удалить токены повторной отправки формы записи старше BOOKING_SUBMISSION_TTL. "
+        "Запускать ежедневно"
+    )
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"Удалено токенов: {deleted}"))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from bookings import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправить письма из очереди уведомлений. По умолчанию работает "
+        "постоянно, с --once отправляет накопившиеся письма и завершается"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Отправить очередь и выйти")
+        parser.add_argument(
+            "--batch-size", type=int, default=outbox.BATCH_SIZE,
+            help="Писем за одно SMTP-соединение",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Пауза между проверками пустой очереди, сек",
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = outbox.send_batch(options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Отправлено: {sent}, с ошибкой: {failed}")
+            if sent + failed < options["batch_size"]:
+                # Очередь разобрана
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Всего отправлено: {total_sent}, с ошибкой: {total_failed}")
+        )
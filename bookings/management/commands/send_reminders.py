@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from bookings import reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Поставить в очередь уведомлений напоминания о подтверждённых записях "
+        "на ближайшие BOOKING_REMINDER_LEAD_HOURS часов. Запускать каждую минуту"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lead-hours", type=int, default=reminders.LEAD_HOURS,
+            help="За сколько часов до записи напоминать",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=reminders.CHUNK_SIZE,
+            help="Записей в одной пачке",
+        )
+
+    def handle(self, *args, **options):
+        queued = reminders.send_reminders(
+            lead_hours=options["lead_hours"], chunk_size=options["chunk_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(f"Напоминаний поставлено в очередь: {queued}"))
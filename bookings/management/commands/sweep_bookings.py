@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from bookings import sweeps, waitlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Отменить неподтверждённые вовремя записи, передать истёкшие предложения "
+        "листа ожидания следующим и показать прошедшие подтверждённые записи, "
+        "которые ждут отметки. Запускать каждые несколько минут"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=sweeps.BATCH_SIZE,
+            help="Записей в одной транзакции",
+        )
+
+    def handle(self, *args, **options):
+        expired = sweeps.expire_pending(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Отменено неподтверждённых: {expired}"))
+        offers = waitlist.expire_offers()
+        self.stdout.write(self.style.SUCCESS(f"Истекло предложений листа ожидания: {offers}"))
+        unresolved = sweeps.unresolved_past().count()
+        if unresolved:
+            self.stdout.write(
+                self.style.WARNING(f"Прошедших записей ждут отметки о визите: {unresolved}")
+            )
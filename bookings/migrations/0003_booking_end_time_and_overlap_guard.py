@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+from bookings import overlap_guard
+
+
+def fill_end_time(apps, schema_editor):
+    """Заполняем время окончания существующих записей по длительности услуги"""
+    Booking = apps.get_model("bookings", "Booking")
+    bookings = Booking.objects.select_related("service").only(
+        "appointment_date", "appointment_time", "service__duration_minutes"
+    )
+    for booking in bookings.iterator(chunk_size=500):
+        start = datetime.combine(booking.appointment_date, booking.appointment_time)
+        end = min(
+            start + timedelta(minutes=booking.service.duration_minutes),
+            datetime.combine(booking.appointment_date, time.max),
+        )
+        Booking.objects.filter(pk=booking.pk).update(end_time=end.time())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_alter_booking_appointment_date_and_more'),
+        ('services', '0006_alter_service_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='booking',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='end_time',
+            field=models.TimeField(editable=False, null=True, verbose_name='Время окончания'),
+        ),
+        migrations.RunPython(fill_end_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='booking',
+            name='end_time',
+            field=models.TimeField(editable=False, verbose_name='Время окончания'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['staff', 'appointment_date', 'appointment_time', 'end_time'], name='booking_staff_interval_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), fields=('staff', 'appointment_date', 'appointment_time'), name='booking_unique_active_slot'),
+        ),
+        migrations.RunPython(overlap_guard.install, overlap_guard.uninstall),
+    ]
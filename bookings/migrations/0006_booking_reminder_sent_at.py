@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_outboxmessage'),
+        ('services', '0006_alter_service_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Напоминание отправлено'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['appointment_date', 'status'], name='booking_date_status_idx'),
+        ),
+    ]
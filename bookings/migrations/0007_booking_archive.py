@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_reminder_sent_at'),
+        ('services', '0006_alter_service_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('appointment_date', models.DateField(verbose_name='Дата записи')),
+                ('appointment_time', models.TimeField(verbose_name='Время записи')),
+                ('end_time', models.TimeField(verbose_name='Время окончания')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('completed', 'Выполнено'), ('cancelled', 'Отменено'), ('no_show', 'Клиент не пришёл')], max_length=16, verbose_name='Статус')),
+                ('notes', models.TextField(blank=True, verbose_name='Заметки')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('review_rating', models.IntegerField(blank=True, null=True, verbose_name='Рейтинг отзыва')),
+                ('review_comment', models.TextField(blank=True, verbose_name='Комментарий отзыва')),
+                ('review_created_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отзыва')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата архивации')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='services.service', verbose_name='Услуга')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_staff_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Мастер')),
+            ],
+            options={
+                'verbose_name': 'Архивная запись',
+                'verbose_name_plural': 'Архив записей',
+                'ordering': ['appointment_date', 'appointment_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingHistoryArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('action', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('completed', 'Завершено'), ('cancelled', 'Отменено'), ('no_show', 'Клиент не пришел')], max_length=16, verbose_name='Действие')),
+                ('notes', models.TextField(blank=True, verbose_name='Заметки')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='bookings.bookingarchive', verbose_name='Бронирование')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Архивная история бронирования',
+                'verbose_name_plural': 'Архив истории бронирований',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookingarchive',
+            index=models.Index(fields=['client', 'appointment_date', 'appointment_time'], name='booking_archive_client_idx'),
+        ),
+    ]
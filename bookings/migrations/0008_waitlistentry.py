@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_archive'),
+        ('services', '0006_alter_service_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField(verbose_name='С даты')),
+                ('date_to', models.DateField(verbose_name='По дату')),
+                ('time_from', models.TimeField(blank=True, null=True, verbose_name='Не раньше')),
+                ('time_to', models.TimeField(blank=True, null=True, verbose_name='Не позже')),
+                ('status', models.CharField(choices=[('waiting', 'Ожидает'), ('offered', 'Предложено время'), ('closed', 'Закрыто')], default='waiting', max_length=16, verbose_name='Статус')),
+                ('offered_date', models.DateField(blank=True, null=True, verbose_name='Предложенная дата')),
+                ('offered_time', models.TimeField(blank=True, null=True, verbose_name='Предложенное время')),
+                ('offered_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата предложения')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('category', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='services.servicecategory', verbose_name='Категория')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('offered_staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Предложенный мастер')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='services.service', verbose_name='Услуга')),
+                ('staff', models.ForeignKey(blank=True, help_text='Пусто - подойдёт любой мастер', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='staff_waitlist_entries', to=settings.AUTH_USER_MODEL, verbose_name='Мастер')),
+            ],
+            options={
+                'verbose_name': 'Лист ожидания',
+                'verbose_name_plural': 'Лист ожидания',
+                'ordering': ['created_at', 'id'],
+                'indexes': [models.Index(condition=models.Q(('status', 'waiting')), fields=['category', 'date_from', 'date_to'], name='waitlist_open_idx')],
+            },
+        ),
+    ]
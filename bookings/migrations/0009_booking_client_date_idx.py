@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0008_waitlistentry'),
+        ('services', '0006_alter_service_description_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['client', 'appointment_date', 'appointment_time'], name='booking_client_date_idx'),
+        ),
+    ]
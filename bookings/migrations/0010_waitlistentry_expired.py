@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_booking_client_date_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='status',
+            field=models.CharField(choices=[('waiting', 'Ожидает'), ('offered', 'Предложено время'), ('expired', 'Предложение истекло'), ('closed', 'Закрыто')], default='waiting', max_length=16, verbose_name='Статус'),
+        ),
+    ]
@@ -1,8 +1,76 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from users.models import User
-from services.models import Service
+from services.models import Service, ServiceCategory
+from . import notifications
+from .signals import bookings_transitioned
+
+
+class BookingQuerySet(models.QuerySet):
+    def active(self):
+        """Записи, занимающие время мастера (все, кроме отменённых)"""
+        return self.exclude(status=Booking.Status.CANCELLED)
+
+    def overlapping(self, staff, date, start_time, end_time):
+        """Активные записи мастера, пересекающиеся с интервалом [start_time, end_time).
+
+        Использует индекс (staff, appointment_date, appointment_time, end_time).
+        """
+        return self.active().filter(
+            staff=staff,
+            appointment_date=date,
+            appointment_time__lt=end_time,
+            end_time__gt=start_time,
+        )
+
+
+class BookingManager(models.Manager.from_queryset(BookingQuerySet)):
+    # Размер пачки для UPDATE ... WHERE id IN (...)
+    TRANSITION_BATCH_SIZE = 500
+
+    def transition(self, queryset, new_status, user=None):
+        """Массовая смена статуса записей queryset.
+
+        Выполняет UPDATE и bulk_create истории только для записей, из статуса
+        которых разрешён переход в new_status (см. Booking.TRANSITIONS);
+        недопустимые переходы отсекаются в SQL. Возвращает пару
+        (изменено, пропущено из-за недопустимого перехода).
+        """
+        sources = self.model.allowed_sources(new_status)
+        updated = 0
+        with transaction.atomic():
+            skipped = (
+                queryset.exclude(status=new_status).exclude(status__in=sources).count()
+            )
+            rows = list(
+                queryset.select_for_update(of=("self",))
+                .filter(status__in=sources)
+                .order_by("pk")
+                .values("staff_id", "client_id", *notifications.FIELDS)
+            )
+            changed = [(row["pk"], row["staff_id"], row["appointment_date"]) for row in rows]
+            for start in range(0, len(changed), self.TRANSITION_BATCH_SIZE):
+                batch = changed[start:start + self.TRANSITION_BATCH_SIZE]
+                updated += (
+                    self.filter(pk__in=[pk for pk, _, _ in batch], status__in=sources)
+                    .update(status=new_status, updated_at=timezone.now())
+                )
+            BookingHistory.objects.bulk_create(
+                [BookingHistory(booking_id=pk, action=new_status, user=user) for pk, _, _ in changed],
+                batch_size=self.TRANSITION_BATCH_SIZE,
+            )
+            OutboxMessage.enqueue(rows, new_status)
+            if changed:
+                bookings_transitioned.send(
+                    sender=self.model,
+                    bookings=changed,
+                    clients={row["client_id"] for row in rows},
+                    status=new_status,
+                    user=user,
+                )
+        return updated, skipped
 
 
 class Booking(models.Model):
@@ -23,6 +91,8 @@ class Booking(models.Model):
     # Время записи
     appointment_date = models.DateField(verbose_name="Дата записи")
     appointment_time = models.TimeField(verbose_name="Время записи")
+    # Снимок длительности услуги на момент записи
+    end_time = models.TimeField(editable=False, verbose_name="Время окончания")
 
     # Статус и метаданные
     status = models.CharField(
@@ -34,55 +104,215 @@ class Booking(models.Model):
     # Временные метки
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    reminder_sent_at = models.DateTimeField(
+        null=True, blank=True, editable=False, verbose_name="Напоминание отправлено"
+    )
+
+    objects = BookingManager()
+
+    # Давние завершённые записи переносятся в BookingArchive
+    is_archived = False
 
     class Meta:
         verbose_name = "Бронирование"
         verbose_name_plural = "Бронирования"
         ordering = ["appointment_date", "appointment_time"]
-        # Один мастер не может иметь две записи в одно время
-        unique_together = ("staff", "appointment_date", "appointment_time")
+        constraints = [
+            # Один мастер не может иметь две активные записи в одно время.
+            # Пересечения интервалов запрещены на уровне БД (см. миграцию 0003)
+            models.UniqueConstraint(
+                fields=["staff", "appointment_date", "appointment_time"],
+                condition=~models.Q(status="cancelled"),
+                name="booking_unique_active_slot",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["staff", "appointment_date", "appointment_time", "end_time"],
+                name="booking_staff_interval_idx",
+            ),
+            # Выборка записей на ближайшие дни для напоминаний
+            models.Index(fields=["appointment_date", "status"], name="booking_date_status_idx"),
+            # Постраничный вывод записей клиента ("Мои записи")
+            models.Index(
+                fields=["client", "appointment_date", "appointment_time"],
+                name="booking_client_date_idx",
+            ),
+        ]
+
+    # Допустимые переходы статусов; завершённые и отменённые - конечные,
+    # ошибочно отмеченную неявку можно исправить на "выполнено"
+    TRANSITIONS = {
+        Status.PENDING: {Status.CONFIRMED, Status.CANCELLED},
+        Status.CONFIRMED: {Status.COMPLETED, Status.CANCELLED, Status.NO_SHOW},
+        Status.COMPLETED: set(),
+        Status.CANCELLED: set(),
+        Status.NO_SHOW: {Status.COMPLETED},
+    }
+
+    @classmethod
+    def allowed_sources(cls, status):
+        """Статусы, из которых разрешён переход в status"""
+        return [source for source, targets in cls.TRANSITIONS.items() if status in targets]
+
+    def can_transition_to(self, status):
+        """Разрешён ли переход из исходного статуса записи в status"""
+        source = self.original.get("status")
+        return source is None or source == status or status in self.TRANSITIONS.get(source, ())
+
+    # Поля, исходные значения которых запоминаются при загрузке из БД
+    TRACKED_FIELDS = (
+        "status",
+        "client_id",
+        "staff_id",
+        "service_id",
+        "appointment_date",
+        "appointment_time",
+        "end_time",
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original = {
+            name: instance.__dict__.get(name) for name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    @property
+    def original(self):
+        """Значения отслеживаемых полей на момент загрузки (пусто для новой записи)"""
+        original = getattr(self, "_original", None)
+        if original is None and self.pk:
+            # Объект создан вручную с pk - читаем исходные значения один раз
+            original = (
+                Booking.objects.filter(pk=self.pk).values(*self.TRACKED_FIELDS).first()
+            )
+            self._original = original
+        return original or {}
+
+    def has_changed(self, name):
+        """Изменилось ли поле с момента загрузки (для новой записи - всегда да)"""
+        original = self.original
+        if not original:
+            return True
+        return original.get(name) != getattr(self, name)
 
     def __str__(self) -> str:
-        client_name = self.client.get_full_name() if self.client else "Без клиента"
-        service_name = self.service.name if self.service else "Без услуги"
+        client_name = self.client.get_full_name() if self.client_id else "Без клиента"
+        service_name = self.service.name if self.service_id else "Без услуги"
         return f"{client_name} → {service_name} ({self.appointment_date} {self.appointment_time})"
 
     def clean(self):
         """Валидация бронирования"""
         super().clean()
 
-        # Проверяем роли только если объекты установлены
-        if self.client and self.client.role != User.Roles.CLIENT:
+        # Проверяем только изменившиеся связи, чтобы не загружать лишние объекты
+        if self.client_id and self.has_changed("client_id") and self.client.role != User.Roles.CLIENT:
             raise ValidationError("Бронирование может создать только клиент")
 
-        if self.staff and self.staff.role != User.Roles.STAFF:
+        if self.staff_id and self.has_changed("staff_id") and self.staff.role != User.Roles.STAFF:
             raise ValidationError("Мастер должен иметь роль 'staff'")
 
         # Проверяем услугу только если она установлена
-        if self.service and not self.service.is_active:
+        if self.service_id and self.has_changed("service_id") and not self.service.is_active:
             raise ValidationError("Услуга неактивна")
 
+        if self.has_changed("status") and not self.can_transition_to(self.status):
+            raise ValidationError(
+                {
+                    "status": "Недопустимая смена статуса: «%s» → «%s»"
+                    % (
+                        self.Status(self.original["status"]).label,
+                        self.get_status_display(),
+                    )
+                }
+            )
+
+        # Пересечение с другими записями мастера проверяем до сохранения,
+        # иначе защита в БД (триггер/ограничение) вернёт IntegrityError
+        if (
+            self.status != self.Status.CANCELLED
+            and self.staff_id
+            and self.service_id
+            and self.appointment_date
+            and self.appointment_time
+            and any(
+                self.has_changed(name)
+                for name in ("staff_id", "service_id", "appointment_date", "appointment_time")
+            )
+        ):
+            end_time = self.end_time
+            if end_time is None or self.has_changed("service_id") or self.has_changed("appointment_time"):
+                end_time = self.calculate_end_time()
+            overlapping = Booking.objects.overlapping(
+                self.staff_id, self.appointment_date, self.appointment_time, end_time
+            )
+            if self.pk:
+                overlapping = overlapping.exclude(pk=self.pk)
+            if overlapping.exists():
+                raise ValidationError(
+                    "Мастер в это время занят или услуга не помещается в расписание"
+                )
+
         # Валидация даты перенесена в форму для лучшего UX
 
     def save(self, *args, **kwargs):
         """Переопределяем save для автоматической валидации и истории изменений"""
         # Извлекаем пользователя из kwargs, если передан
         user = kwargs.pop('user', None)
+        is_new = not self.original
+        status_changed = not is_new and self.has_changed("status")
+
+        # Время окончания пересчитываем только при смене услуги или времени,
+        # чтобы изменение длительности услуги не затрагивало старые записи
+        if (
+            self.end_time is None
+            or self.has_changed("service_id")
+            or self.has_changed("appointment_time")
+        ):
+            self.end_time = self.calculate_end_time()
+
+        # Перенесённой записи нужно новое напоминание
+        if self.reminder_sent_at and (
+            self.has_changed("appointment_date") or self.has_changed("appointment_time")
+        ):
+            self.reminder_sent_at = None
+
+        # Неизменившиеся связи не валидируем - это лишние запросы к БД
+        self.full_clean(
+            exclude=[
+                name
+                for name in ("client", "staff", "service")
+                if not self.has_changed(f"{name}_id")
+            ]
+        )
 
-        # Проверяем, изменился ли статус
-        if self.pk:  # Если объект уже существует
-            old_booking = Booking.objects.get(pk=self.pk)
-            if old_booking.status != self.status:
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if status_changed:
                 # Создаем запись в истории
-                from .models import BookingHistory
                 BookingHistory.objects.create(
                     booking=self,
                     action=self.status,
                     user=user
                 )
+            if is_new or status_changed:
+                # Письмо клиенту отправится после фиксации транзакции (см. bookings.outbox)
+                OutboxMessage.enqueue(
+                    Booking.objects.filter(pk=self.pk).values(*notifications.FIELDS),
+                    notifications.CREATED if is_new else self.status,
+                )
 
-        self.full_clean()
-        super().save(*args, **kwargs)
+        self._original = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def calculate_end_time(self, duration_minutes=None):
+        """Время окончания записи (не позже конца суток)"""
+        if duration_minutes is None:
+            duration_minutes = self.service.duration_minutes
+        start = datetime.combine(self.appointment_date, self.appointment_time)
+        end_of_day = datetime.combine(self.appointment_date, time.max)
+        return min(start + timedelta(minutes=duration_minutes), end_of_day).time()
 
     @property
     def duration_minutes(self):
@@ -122,6 +352,56 @@ class BookingHistory(models.Model):
         return f"{self.booking} - {self.get_action_display()}"
     
 
+class OutboxMessage(models.Model):
+    """Исходящее письмо, ожидающее отправки фоновым процессом"""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Ожидает отправки"
+        SENT = "sent", "Отправлено"
+        FAILED = "failed", "Ошибка отправки"
+
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="notifications", verbose_name="Бронирование",
+    )
+    event = models.CharField(max_length=32, verbose_name="Событие")
+    recipient = models.EmailField(verbose_name="Получатель")
+    subject = models.CharField(max_length=255, verbose_name="Тема")
+    body = models.TextField(verbose_name="Текст")
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING, verbose_name="Статус"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток отправки")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата отправки")
+
+    class Meta:
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+        ordering = ["id"]
+        indexes = [
+            # Выборка очереди фоновым процессом
+            models.Index(fields=["status", "next_attempt_at"], name="outbox_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject}"
+
+    @classmethod
+    def enqueue(cls, rows, event):
+        """Поставить в очередь письма о событии event для записей rows
+        (словари с полями notifications.FIELDS). Вызывать внутри транзакции
+        изменения записей."""
+        messages = [
+            cls(**message)
+            for message in (notifications.render(row, event) for row in rows)
+            if message
+        ]
+        return cls.objects.bulk_create(messages, batch_size=500)
+
+
 class Review(models.Model):
     """Отзывы о мастерах"""
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, verbose_name="Бронирование")
@@ -139,3 +419,168 @@ class Review(models.Model):
 
     def __str__(self):
         return f"Отзыв на {self.booking} - {self.rating}⭐"
+
+
+class BookingSubmission(models.Model):
+    """Отправка формы записи с токеном идемпотентности.
+
+    Основное хранилище токенов - кеш (см. bookings.idempotency); таблица
+    нужна, чтобы повторная отправка распознавалась и после сброса кеша,
+    и при нескольких процессах с локальным кешем.
+    """
+
+    token = models.CharField(max_length=64, unique=True, verbose_name="Токен")
+    client = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Клиент")
+    booking = models.ForeignKey(
+        Booking, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Бронирование"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Отправка формы записи"
+        verbose_name_plural = "Отправки форм записи"
+
+    def __str__(self):
+        return self.token
+
+
+class BookingArchive(models.Model):
+    """Завершённая давняя запись, перенесённая из Booking (см. bookings.archive).
+
+    Первичный ключ совпадает с id исходной записи; отзыв хранится здесь же.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_bookings", verbose_name="Клиент"
+    )
+    staff = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_staff_bookings", verbose_name="Мастер"
+    )
+    service = models.ForeignKey(Service, on_delete=models.PROTECT, verbose_name="Услуга")
+    appointment_date = models.DateField(verbose_name="Дата записи")
+    appointment_time = models.TimeField(verbose_name="Время записи")
+    end_time = models.TimeField(verbose_name="Время окончания")
+    status = models.CharField(max_length=16, choices=Booking.Status.choices, verbose_name="Статус")
+    notes = models.TextField(blank=True, verbose_name="Заметки")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата обновления")
+    review_rating = models.IntegerField(null=True, blank=True, verbose_name="Рейтинг отзыва")
+    review_comment = models.TextField(blank=True, verbose_name="Комментарий отзыва")
+    review_created_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата отзыва")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата архивации")
+
+    # Запись из архива нельзя отменить или оценить
+    is_archived = True
+
+    class Meta:
+        verbose_name = "Архивная запись"
+        verbose_name_plural = "Архив записей"
+        ordering = ["appointment_date", "appointment_time"]
+        indexes = [
+            models.Index(
+                fields=["client", "appointment_date", "appointment_time"],
+                name="booking_archive_client_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.client} → {self.service} ({self.appointment_date} {self.appointment_time})"
+
+    @property
+    def review(self):
+        """Отзыв в том же виде, что и Review у действующей записи (или None)"""
+        if self.review_rating is None:
+            return None
+        return Review(
+            rating=self.review_rating, comment=self.review_comment, created_at=self.review_created_at
+        )
+
+
+class BookingHistoryArchive(models.Model):
+    """История архивной записи"""
+
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.ForeignKey(
+        BookingArchive, on_delete=models.CASCADE, related_name="history", verbose_name="Бронирование"
+    )
+    action = models.CharField(max_length=16, choices=BookingHistory.Action.choices, verbose_name="Действие")
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Пользователь")
+    notes = models.TextField(blank=True, verbose_name="Заметки")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Архивная история бронирования"
+        verbose_name_plural = "Архив истории бронирований"
+        ordering = ["-created_at"]
+
+    def __str__(self) -> str:
+        return f"{self.booking} - {self.get_action_display()}"
+
+
+class WaitlistEntry(models.Model):
+    """Клиент ждёт освободившееся время (см. bookings.waitlist)"""
+
+    class Status(models.TextChoices):
+        WAITING = "waiting", "Ожидает"
+        OFFERED = "offered", "Предложено время"
+        EXPIRED = "expired", "Предложение истекло"
+        CLOSED = "closed", "Закрыто"
+
+    client = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="waitlist_entries", verbose_name="Клиент"
+    )
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, verbose_name="Услуга")
+    # Категория услуги дублируется для поиска по индексу без JOIN
+    category = models.ForeignKey(
+        ServiceCategory, on_delete=models.CASCADE, editable=False, verbose_name="Категория"
+    )
+    staff = models.ForeignKey(
+        User, on_delete=models.CASCADE, null=True, blank=True,
+        related_name="staff_waitlist_entries", verbose_name="Мастер",
+        help_text="Пусто - подойдёт любой мастер",
+    )
+    date_from = models.DateField(verbose_name="С даты")
+    date_to = models.DateField(verbose_name="По дату")
+    time_from = models.TimeField(null=True, blank=True, verbose_name="Не раньше")
+    time_to = models.TimeField(null=True, blank=True, verbose_name="Не позже")
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.WAITING, verbose_name="Статус"
+    )
+    offered_date = models.DateField(null=True, blank=True, verbose_name="Предложенная дата")
+    offered_time = models.TimeField(null=True, blank=True, verbose_name="Предложенное время")
+    offered_staff = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="+", verbose_name="Предложенный мастер",
+    )
+    offered_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата предложения")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    class Meta:
+        verbose_name = "Лист ожидания"
+        verbose_name_plural = "Лист ожидания"
+        ordering = ["created_at", "id"]
+        indexes = [
+            # Поиск ожидающих на освободившийся день - один диапазонный запрос
+            # только по открытым заявкам
+            models.Index(
+                fields=["category", "date_from", "date_to"],
+                condition=models.Q(status="waiting"),
+                name="waitlist_open_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.client} ждёт «{self.service}» {self.date_from} - {self.date_to}"
+
+    def clean(self):
+        super().clean()
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise ValidationError("Дата начала позже даты окончания")
+        if self.time_from and self.time_to and self.time_from >= self.time_to:
+            raise ValidationError("Время начала должно быть раньше времени окончания")
+
+    def save(self, *args, **kwargs):
+        if self.service_id:
+            self.category_id = self.service.category_id
+        super().save(*args, **kwargs)
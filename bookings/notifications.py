@@ -0,0 +1,64 @@
+"""Тексты уведомлений клиенту о записи.
+
+Письма не отправляются из запроса: они сохраняются в таблицу OutboxMessage
+в той же транзакции, что и изменение записи, а отправляет их фоновый
+процесс (manage.py send_notifications, см. bookings.outbox).
+"""
+from django.template.loader import render_to_string
+
+
+# Поля записи, нужные для текста письма (читаются одним запросом через values())
+FIELDS = (
+    "pk",
+    "client__email",
+    "client__first_name",
+    "staff__first_name",
+    "service__name",
+    "appointment_date",
+    "appointment_time",
+)
+
+CREATED = "created"
+REMINDER = "reminder"
+WAITLIST_OFFER = "waitlist_offer"
+
+SUBJECTS = {
+    CREATED: "Вы записаны в салон красоты",
+    "confirmed": "Ваша запись подтверждена",
+    "cancelled": "Ваша запись отменена",
+    "completed": "Спасибо за визит!",
+    "no_show": "Вы пропустили запись",
+    REMINDER: "Напоминание о записи в салон красоты",
+    WAITLIST_OFFER: "Освободилось время для записи",
+}
+
+
+def booking_row(booking):
+    """Поля FIELDS из загруженной записи (с select_related клиента, мастера и услуги)"""
+    return {
+        "pk": booking.pk,
+        "client__email": booking.client.email,
+        "client__first_name": booking.client.first_name,
+        "staff__first_name": booking.staff.first_name,
+        "service__name": booking.service.name,
+        "appointment_date": booking.appointment_date,
+        "appointment_time": booking.appointment_time,
+    }
+
+
+def render(row, event):
+    """Письмо о событии event для записи row (словарь с полями FIELDS).
+
+    Возвращает параметры OutboxMessage или None, если письмо не нужно.
+    """
+    if event not in SUBJECTS or not row["client__email"]:
+        return None
+    return {
+        "booking_id": row["pk"],
+        "event": event,
+        "recipient": row["client__email"],
+        "subject": SUBJECTS[event],
+        "body": render_to_string(
+            "bookings/email/booking_notification.txt", {"booking": row, "event": event}
+        ),
+    }
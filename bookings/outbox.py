@@ -0,0 +1,91 @@
+"""Отправка писем из очереди OutboxMessage.
+
+Письма отправляются пачками через одно SMTP-соединение. При ошибке
+письмо откладывается с экспоненциально растущей паузой, после
+MAX_ATTEMPTS неудачных попыток помечается как ошибочное.
+Рассчитано на один запущенный процесс send_notifications.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = getattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 5)
+RETRY_DELAY_SECONDS = 60
+RETRY_MAX_DELAY_SECONDS = 60 * 60
+
+
+def retry_delay(attempts):
+    """Пауза перед следующей попыткой: 1, 2, 4, ... минут, не больше часа"""
+    return timedelta(seconds=min(RETRY_DELAY_SECONDS * 2 ** (attempts - 1), RETRY_MAX_DELAY_SECONDS))
+
+
+def due_messages(batch_size=BATCH_SIZE):
+    return list(
+        OutboxMessage.objects.filter(
+            status=OutboxMessage.Status.PENDING, next_attempt_at__lte=timezone.now()
+        ).order_by("next_attempt_at", "id")[:batch_size]
+    )
+
+
+def defer(message, error):
+    """Отложить письмо после неудачной попытки"""
+    attempts = message.attempts + 1
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        attempts=attempts,
+        last_error=str(error)[:1000],
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        status=(
+            OutboxMessage.Status.FAILED
+            if attempts >= MAX_ATTEMPTS
+            else OutboxMessage.Status.PENDING
+        ),
+    )
+
+
+def send_batch(batch_size=BATCH_SIZE, connection=None):
+    """Отправить одну пачку писем. Возвращает (отправлено, с ошибкой)"""
+    messages = due_messages(batch_size)
+    if not messages:
+        return 0, 0
+
+    connection = connection or get_connection()
+    try:
+        # Соединение открывается один раз на всю пачку
+        connection.open()
+    except Exception as error:  # Сервер недоступен - откладываем всю пачку
+        for message in messages:
+            defer(message, error)
+        return 0, len(messages)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for message in messages:
+            email = EmailMessage(
+                subject=message.subject,
+                body=message.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[message.recipient],
+                connection=connection,
+            )
+            try:
+                email.send()
+            except Exception as error:  # Ошибку SMTP фиксируем и повторяем позже
+                failed += 1
+                defer(message, error)
+            else:
+                sent_ids.append(message.pk)
+    finally:
+        connection.close()
+
+    if sent_ids:
+        OutboxMessage.objects.filter(pk__in=sent_ids).update(
+            status=OutboxMessage.Status.SENT, sent_at=timezone.now(), last_error=""
+        )
+    return len(sent_ids), failed
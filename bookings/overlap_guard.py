@@ -0,0 +1,61 @@
+"""Защита от пересечения записей одного мастера на уровне БД.
+
+В SQLite используются триггеры, в PostgreSQL - exclusion constraint.
+Функции вызываются из миграций; при пересоздании таблицы bookings_booking
+в SQLite триггеры нужно установить заново.
+"""
+
+_SQLITE_CHECK = """
+    SELECT RAISE(ABORT, 'bookings_booking: overlapping booking')
+    WHERE EXISTS (
+        SELECT 1 FROM bookings_booking
+        WHERE staff_id = NEW.staff_id
+          AND appointment_date = NEW.appointment_date
+          AND status <> 'cancelled'
+          AND appointment_time < NEW.end_time
+          AND end_time > NEW.appointment_time
+          {extra}
+    );
+"""
+
+INSTALL = {
+    "sqlite": [
+        "CREATE TRIGGER IF NOT EXISTS bookings_booking_no_overlap_insert "
+        "BEFORE INSERT ON bookings_booking "
+        "WHEN NEW.status <> 'cancelled' "
+        "BEGIN" + _SQLITE_CHECK.format(extra="") + "END",
+        "CREATE TRIGGER IF NOT EXISTS bookings_booking_no_overlap_update "
+        "BEFORE UPDATE OF staff_id, appointment_date, appointment_time, end_time, status "
+        "ON bookings_booking "
+        "WHEN NEW.status <> 'cancelled' "
+        "BEGIN" + _SQLITE_CHECK.format(extra="AND id <> NEW.id") + "END",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS btree_gist",
+        "ALTER TABLE bookings_booking ADD CONSTRAINT bookings_booking_no_overlap "
+        "EXCLUDE USING gist ("
+        "staff_id WITH =, "
+        "tsrange(appointment_date + appointment_time, appointment_date + end_time) WITH &&"
+        ") WHERE (status <> 'cancelled')",
+    ],
+}
+
+UNINSTALL = {
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS bookings_booking_no_overlap_insert",
+        "DROP TRIGGER IF EXISTS bookings_booking_no_overlap_update",
+    ],
+    "postgresql": [
+        "ALTER TABLE bookings_booking DROP CONSTRAINT IF EXISTS bookings_booking_no_overlap",
+    ],
+}
+
+
+def install(apps, schema_editor):
+    for statement in INSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def uninstall(apps, schema_editor):
+    for statement in UNINSTALL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
@@ -0,0 +1,72 @@
+"""Напоминания клиентам о подтверждённых записях.
+
+Задача запускается раз в минуту (manage.py send_reminders). Записи, о которых
+уже напомнили, отмечены reminder_sent_at и повторно не выбираются; выборка
+идёт по индексу (appointment_date, status) и читается потоком пачками,
+поэтому объём памяти не зависит от числа записей на день.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import notifications
+from .models import Booking, OutboxMessage
+
+
+LEAD_HOURS = getattr(settings, "BOOKING_REMINDER_LEAD_HOURS", 24)
+CHUNK_SIZE = 1000
+
+
+def due_reminders(now=None, lead_hours=LEAD_HOURS):
+    """Подтверждённые записи, до начала которых осталось не больше lead_hours
+    и о которых ещё не напоминали"""
+    now = timezone.localtime(now or timezone.now())
+    until = now + timedelta(hours=lead_hours)
+    today, current = now.date(), now.time()
+    return (
+        Booking.objects.filter(
+            status=Booking.Status.CONFIRMED,
+            appointment_date__range=(today, until.date()),
+            reminder_sent_at__isnull=True,
+        )
+        # Уже начавшиеся сегодня и слишком далёкие в последний день - не напоминаем
+        .exclude(appointment_date=today, appointment_time__lte=current)
+        .exclude(appointment_date=until.date(), appointment_time__gt=until.time())
+        .exclude(client__email="")
+    )
+
+
+def _flush(chunk, sent_at):
+    """Поставить письма пачки в очередь и отметить записи одной транзакцией"""
+    with transaction.atomic():
+        OutboxMessage.enqueue(
+            (notifications.booking_row(booking) for booking in chunk),
+            notifications.REMINDER,
+        )
+        Booking.objects.filter(
+            pk__in=[booking.pk for booking in chunk], reminder_sent_at__isnull=True
+        ).update(reminder_sent_at=sent_at)
+
+
+def send_reminders(now=None, lead_hours=LEAD_HOURS, chunk_size=CHUNK_SIZE):
+    """Поставить в очередь напоминания о ближайших записях. Возвращает их число"""
+    sent_at = timezone.now()
+    queryset = (
+        due_reminders(now, lead_hours)
+        .select_related("client", "service", "staff")
+        .order_by("appointment_date", "appointment_time", "pk")
+    )
+    total = 0
+    chunk = []
+    for booking in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(booking)
+        if len(chunk) >= chunk_size:
+            _flush(chunk, sent_at)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        _flush(chunk, sent_at)
+        total += len(chunk)
+    return total
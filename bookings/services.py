@@ -0,0 +1,116 @@
+"""Создание записей без гонок при одновременной отправке форм.
+
+Проверка доступности в форме и сохранение выполняются в разных запросах
+к БД, поэтому два клиента могут одновременно занять один слот. Здесь
+создание записи сериализуется по мастеру и дню, а пересечение повторно
+проверяется уже внутри транзакции.
+"""
+import random
+import time
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+
+from users.models import User
+from . import notifications
+from .models import Booking, OutboxMessage
+from .signals import bookings_created
+
+
+# Сколько раз повторять транзакцию, если БД занята другой записью
+LOCK_RETRIES = 5
+LOCK_RETRY_DELAY = 0.05
+
+
+class BookingConflict(Exception):
+    """Выбранное время мастера уже занято"""
+
+    message = "Мастер в это время занят или услуга не помещается в расписание"
+
+    def __init__(self, message=None):
+        super().__init__(message or self.message)
+
+
+def lock_staff_day(staff_id, date):
+    """Блокировка на (мастер, день) до конца текущей транзакции.
+
+    PostgreSQL - advisory lock, SQLite - транзакция уже начата как
+    BEGIN IMMEDIATE (см. DATABASES в settings), остальные БД - блокировка
+    строки мастера.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s, %s)", [staff_id, date.toordinal()])
+    elif connection.vendor != "sqlite":
+        list(User.objects.select_for_update().filter(pk=staff_id).values_list("pk", flat=True))
+
+
+def create_booking(client, staff, service, date, start_time):
+    """Создать запись или выбросить BookingConflict, если время занято"""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            with transaction.atomic():
+                lock_staff_day(staff.pk, date)
+                booking = Booking(
+                    client=client,
+                    staff=staff,
+                    service=service,
+                    appointment_date=date,
+                    appointment_time=start_time,
+                )
+                booking.end_time = booking.calculate_end_time()
+                if Booking.objects.overlapping(staff, date, start_time, booking.end_time).exists():
+                    raise BookingConflict()
+                booking.save()
+                return booking
+        except IntegrityError:
+            # Сработала защита от пересечений на уровне БД
+            raise BookingConflict()
+        except OperationalError as error:
+            if "locked" not in str(error) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def create_combo_booking(client, date, plan):
+    """Создать записи на несколько услуг подряд одной транзакцией.
+
+    plan - список (service, staff_id, start_time), см. availability.combo_plan.
+    Если хотя бы одно время уже занято, не создаётся ни одна запись
+    и выбрасывается BookingConflict.
+    """
+    for attempt in range(LOCK_RETRIES):
+        try:
+            with transaction.atomic():
+                # Блокируем дни мастеров в одном порядке, чтобы избежать взаимоблокировок
+                for staff_id in sorted({staff_id for _, staff_id, _ in plan}):
+                    lock_staff_day(staff_id, date)
+                bookings = []
+                for service, staff_id, start_time in plan:
+                    booking = Booking(
+                        client=client,
+                        staff_id=staff_id,
+                        service=service,
+                        appointment_date=date,
+                        appointment_time=start_time,
+                    )
+                    booking.end_time = booking.calculate_end_time()
+                    if Booking.objects.overlapping(
+                        staff_id, date, start_time, booking.end_time
+                    ).exists():
+                        raise BookingConflict()
+                    bookings.append(booking)
+                bookings = Booking.objects.bulk_create(bookings)
+                OutboxMessage.enqueue(
+                    Booking.objects.filter(pk__in=[booking.pk for booking in bookings])
+                    .order_by("appointment_time")
+                    .values(*notifications.FIELDS),
+                    notifications.CREATED,
+                )
+                bookings_created.send(sender=Booking, bookings=bookings)
+                return bookings
+        except IntegrityError:
+            raise BookingConflict()
+        except OperationalError as error:
+            if "locked" not in str(error) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5))
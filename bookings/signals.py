@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+
+# Массовая смена статуса через Booking.objects.transition() (save() не вызывается).
+# Аргументы: bookings - список (pk, staff_id, appointment_date), clients - множество
+# client_id этих записей, status, user.
+# Отправляется внутри транзакции, в которой изменены записи.
+bookings_transitioned = Signal()
+
+# Записи созданы через bulk_create (post_save не отправляется).
+# Аргументы: bookings - список созданных Booking.
+bookings_created = Signal()
@@ -0,0 +1,68 @@
+"""Периодическая уборка статусов записей (manage.py sweep_bookings).
+
+- неподтверждённые записи отменяются, если их не подтвердили за
+  BOOKING_PENDING_TTL_HOURS или время записи уже наступило - слот сразу
+  снова доступен для записи;
+- подтверждённые записи, закончившиеся больше BOOKING_NO_SHOW_GRACE_HOURS
+  назад и так и не отмеченные, только выводятся для проверки: был ли визит,
+  решает администратор (фильтр "Ожидает отметки" в админке). Автоматическая
+  неявка отправила бы клиенту письмо о пропуске, даже если мастер просто
+  забыл отметить выполненную запись.
+
+Записи обрабатываются пачками через Booking.objects.transition(), каждая
+пачка - отдельная короткая транзакция.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Booking
+
+
+PENDING_TTL_HOURS = getattr(settings, "BOOKING_PENDING_TTL_HOURS", 24)
+NO_SHOW_GRACE_HOURS = getattr(settings, "BOOKING_NO_SHOW_GRACE_HOURS", 24)
+BATCH_SIZE = 500
+
+
+def _started_before(moment, field="appointment_time"):
+    """Условие "запись началась (или закончилась, field=end_time) до moment" """
+    moment = timezone.localtime(moment)
+    return Q(appointment_date__lt=moment.date()) | Q(
+        appointment_date=moment.date(), **{f"{field}__lte": moment.time()}
+    )
+
+
+def stale_pending(now=None, ttl_hours=PENDING_TTL_HOURS):
+    now = now or timezone.now()
+    return Booking.objects.filter(status=Booking.Status.PENDING).filter(
+        Q(created_at__lt=now - timedelta(hours=ttl_hours)) | _started_before(now)
+    )
+
+
+def unresolved_past(now=None, grace_hours=NO_SHOW_GRACE_HOURS):
+    """Подтверждённые записи, которые давно закончились, но не отмечены"""
+    now = now or timezone.now()
+    return Booking.objects.filter(status=Booking.Status.CONFIRMED).filter(
+        _started_before(now - timedelta(hours=grace_hours), "end_time")
+    )
+
+
+def sweep(queryset, new_status, batch_size=BATCH_SIZE):
+    """Перевести записи queryset в new_status пачками. Возвращает их число"""
+    total = 0
+    while True:
+        pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return total
+        updated, _ = Booking.objects.transition(Booking.objects.filter(pk__in=pks), new_status)
+        if not updated:
+            # Записи успели изменить параллельно - не зацикливаемся
+            return total
+        total += updated
+
+
+def expire_pending(now=None, ttl_hours=PENDING_TTL_HOURS, batch_size=BATCH_SIZE):
+    return sweep(stale_pending(now, ttl_hours), Booking.Status.CANCELLED, batch_size)
+
@@ -0,0 +1,67 @@
+from datetime import time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from schedule.models import WorkingHours
+from services.models import Service, ServiceCategory
+from users.models import User
+from .models import Booking
+
+
+class SalonFixture:
+    """Общие данные тестов: категория, услуга, мастер, клиент и его рабочий день
+
+    Подмешивается перед TestCase. Отличия задаются атрибутами класса,
+    остальное тест дополняет в своём setUpTestData после super().
+    """
+
+    SERVICE_DURATION = 60
+    DAYS_AHEAD = 1
+    WORKING_HOURS = (time(10, 0), time(18, 0))
+    CLIENT_EMAIL = ""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.category = ServiceCategory.objects.create(name="Стрижки")
+        cls.service = Service.objects.create(
+            category=cls.category, name="Стрижка", duration_minutes=cls.SERVICE_DURATION, price=1000
+        )
+        cls.staff = User.objects.create(
+            username="master", first_name="Анна", role=User.Roles.STAFF, specialization=cls.category
+        )
+        cls.client_user = User.objects.create(
+            username="client", role=User.Roles.CLIENT, email=cls.CLIENT_EMAIL
+        )
+        # Код под тестом считает «сегодня» в часовом поясе салона
+        cls.date = timezone.localdate() + timedelta(days=cls.DAYS_AHEAD)
+        start, end = cls.WORKING_HOURS
+        WorkingHours.objects.create(
+            staff=cls.staff, day_of_week=cls.date.weekday(), start_time=start, end_time=end
+        )
+
+    def setUp(self):
+        super().setUp()
+        # Кеш расписания и каталога не откатывается вместе с транзакцией теста
+        cache.clear()
+
+    @classmethod
+    def build_booking(cls, hour=10, status=Booking.Status.PENDING, *, minute=0, day=None, **fields):
+        """Несохранённая запись клиента к мастеру на день теста"""
+        fields.setdefault("client", cls.client_user)
+        fields.setdefault("staff", cls.staff)
+        fields.setdefault("service", cls.service)
+        return Booking(
+            appointment_date=day or cls.date,
+            appointment_time=time(hour, minute),
+            status=status,
+            **fields,
+        )
+
+    @classmethod
+    def make_booking(cls, hour=10, status=Booking.Status.PENDING, **kwargs):
+        """Запись, сохранённая с полной валидацией модели"""
+        booking = cls.build_booking(hour, status, **kwargs)
+        booking.save()
+        return booking
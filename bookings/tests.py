@@ -1,3 +1,895 @@
-from django.test import TestCase
+import threading
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.http import QueryDict
+from django.urls import reverse
+
+from schedule import availability
+from schedule.models import WorkingHours
+from services import catalog
+from services.models import Service, ServiceCategory
+from users.models import User
+from . import archive, idempotency, outbox, reminders, sweeps, waitlist
+from .forms import BookingForm, ServiceBookingForm
+from .models import (
+    Booking,
+    BookingArchive,
+    BookingHistory,
+    BookingSubmission,
+    OutboxMessage,
+    Review,
+    WaitlistEntry,
+)
+from .services import BookingConflict, create_booking
+from .testing import SalonFixture
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Одновременная отправка формы записи не приводит к двойному бронированию"""
+
+    SUBMITTERS = 50
+
+    def setUp(self):
+        category = ServiceCategory.objects.create(name="Стрижки")
+        self.service = Service.objects.create(
+            category=category, name="Стрижка", duration_minutes=60, price=1000
+        )
+        self.staff = User.objects.create(username="master", role=User.Roles.STAFF)
+        self.clients = [
+            User.objects.create(username=f"client{i}", role=User.Roles.CLIENT)
+            for i in range(self.SUBMITTERS)
+        ]
+        self.date = timezone.localdate() + timedelta(days=1)
+
+    def submit_concurrently(self, start_times):
+        barrier = threading.Barrier(len(start_times))
+        results = []
+        lock = threading.Lock()
+
+        def submit(client, start_time):
+            try:
+                barrier.wait()
+                create_booking(client, self.staff, self.service, self.date, start_time)
+                outcome = "created"
+            except BookingConflict:
+                outcome = "conflict"
+            except Exception as error:  # Любая другая ошибка - провал теста
+                outcome = error
+            finally:
+                connection.close()
+            with lock:
+                results.append(outcome)
+
+        threads = [
+            threading.Thread(target=submit, args=(client, start_time))
+            for client, start_time in zip(self.clients, start_times)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assert_no_overlaps(self):
+        bookings = list(
+            Booking.objects.active()
+            .filter(staff=self.staff, appointment_date=self.date)
+            .order_by("appointment_time")
+        )
+        for previous, current in zip(bookings, bookings[1:]):
+            self.assertLessEqual(previous.end_time, current.appointment_time)
+        return bookings
+
+    def test_same_slot(self):
+        results = self.submit_concurrently([time(10, 0)] * self.SUBMITTERS)
+
+        self.assertEqual(results.count("created"), 1, results)
+        self.assertEqual(results.count("conflict"), self.SUBMITTERS - 1, results)
+        self.assertEqual(len(self.assert_no_overlaps()), 1)
+
+    def test_overlapping_slots(self):
+        # Старты каждые 15 минут при услуге на 60 минут - соседние пересекаются
+        start_times = [time(10 + (i % 8) // 4, (i % 4) * 15) for i in range(self.SUBMITTERS)]
+        results = self.submit_concurrently(start_times)
+
+        created = results.count("created")
+        self.assertEqual(created + results.count("conflict"), self.SUBMITTERS, results)
+        self.assertEqual(len(self.assert_no_overlaps()), created)
+
+
+class SlotsConditionalGetTests(SalonFixture, TestCase):
+    """api/slots/ отвечает 304 только пока свободные слоты не изменились"""
+
+    WORKING_HOURS = (time(10, 0), time(12, 0))
+
+    def setUp(self):
+        super().setUp()
+        self.params = {
+            "service": self.service.pk,
+            "from": self.date.isoformat(),
+            "to": self.date.isoformat(),
+        }
+
+    def get_slots(self, **headers):
+        return self.client.get(reverse("bookings:api_slots_list"), self.params, **headers)
+
+    def test_unchanged_slots_return_304(self):
+        response = self.get_slots()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Last-Modified", response)
+        cached = self.get_slots(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_deleted_booking_returns_200(self):
+        booking = create_booking(self.client_user, self.staff, self.service, self.date, time(10, 0))
+        response = self.get_slots()
+        self.assertNotIn("10:00", [slot["time"] for slot in response.json()])
+
+        # Удаление не меняет максимум updated_at, но меняет ETag
+        booking.delete()
+        changed = self.get_slots(
+            HTTP_IF_NONE_MATCH=response["ETag"],
+            HTTP_IF_MODIFIED_SINCE="Thu, 01 Jan 2099 00:00:00 GMT",
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn("10:00", [slot["time"] for slot in changed.json()])
+
+
+class EarliestSlotsTests(SalonFixture, TestCase):
+    """Ближайшее время у любого мастера ищется фиксированным числом запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.olga = cls.add_staff("olga", "Ольга", time(9, 0), time(11, 0))
+        # Мастер без графика свободного времени не даёт
+        cls.add_staff("irina", "Ирина")
+
+    @classmethod
+    def add_staff(cls, username, first_name, start=None, end=None):
+        staff = User.objects.create(
+            username=username, first_name=first_name, role=User.Roles.STAFF,
+            specialization=cls.category,
+        )
+        if start:
+            WorkingHours.objects.create(
+                staff=staff, day_of_week=cls.date.weekday(), start_time=start, end_time=end
+            )
+        return staff
+
+    def test_slots_of_all_staff_in_time_order(self):
+        self.make_booking(10, staff=self.olga)
+
+        response = self.client.get(
+            reverse("bookings:api_earliest_slots"), {"service": self.service.pk, "limit": 4}
+        )
+
+        self.assertEqual(
+            [(row["staff_name"], row["date"], row["time"]) for row in response.json()],
+            [
+                ("Ольга", self.date.isoformat(), "09:00"),
+                ("Анна", self.date.isoformat(), "10:00"),
+                ("Анна", self.date.isoformat(), "10:30"),
+                ("Анна", self.date.isoformat(), "11:00"),
+            ],
+        )
+        self.assertEqual(
+            availability.earliest_slots(self.service, limit=1),
+            [(self.date, time(9, 0), self.olga.pk)],
+        )
+        self.assertEqual(availability.earliest_slots(self.service, limit=0), [])
+
+    def test_queries_do_not_depend_on_staff_count(self):
+        staff_ids = availability.eligible_staff_ids(self.service)
+        with CaptureQueriesContext(connection) as queries:
+            availability.earliest_slots(self.service, limit=10, staff_ids=staff_ids)
+
+        cache.clear()
+        for i in range(10):
+            self.add_staff(f"extra{i}", "Мастер", time(12, 0), time(18, 0))
+        staff_ids = availability.eligible_staff_ids(self.service)
+        self.assertEqual(len(staff_ids), 13)
+        with self.assertNumQueries(len(queries)):
+            slots = availability.earliest_slots(self.service, limit=10, staff_ids=staff_ids)
+        self.assertEqual(len(slots), 10)
+
+
+class BookingFormSlotTests(SalonFixture, TestCase):
+    """Формы записи предлагают и принимают только свободное время мастера"""
+
+    SERVICE_DURATION = 90
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.short = Service.objects.create(
+            category=cls.category, name="Чёлка", duration_minutes=30, price=300
+        )
+        cls.make_booking(12)  # 12:00 - 13:30
+
+    def booking_form(self, **data):
+        form = BookingForm(data={
+            "service": self.service.pk,
+            "staff": self.staff.pk,
+            "appointment_date": self.date.isoformat(),
+            **data,
+        })
+        form.instance.client = self.client_user
+        return form
+
+    def service_form(self, service, **data):
+        return ServiceBookingForm(
+            data={"staff": self.staff.pk, "appointment_date": self.date.isoformat(), **data},
+            initial={"service": service},
+        )
+
+    def times(self, form):
+        return [value for value, _ in form.fields["appointment_time"].choices if value]
+
+    def test_choices_follow_schedule_and_duration(self):
+        self.assertEqual(
+            self.times(self.booking_form()),
+            ["10:00", "10:30", "13:30", "14:00", "14:30", "15:00", "15:30", "16:00", "16:30"],
+        )
+        self.assertEqual(
+            self.times(self.service_form(self.short)),
+            ["10:00", "10:30", "11:00", "11:30", "13:30", "14:00", "14:30", "15:00",
+             "15:30", "16:00", "16:30", "17:00", "17:30"],
+        )
+
+    def test_past_slots_are_not_offered(self):
+        today = timezone.localdate()
+        for day in (today - timedelta(days=1), today):
+            WorkingHours.objects.create(
+                staff=self.staff, day_of_week=day.weekday(),
+                start_time=time(0, 0), end_time=time(23, 59),
+            )
+        started = timezone.localtime(timezone.now()).time()
+
+        yesterday = self.booking_form(appointment_date=(today - timedelta(days=1)).isoformat())
+        self.assertEqual(self.times(yesterday), [])
+        today_form = self.booking_form(appointment_date=today.isoformat())
+        self.assertTrue(all(value > started.strftime("%H:%M") for value in self.times(today_form)))
+
+    def test_posted_free_slot_is_accepted(self):
+        self.assertTrue(self.booking_form(appointment_time="13:30").is_valid())
+        self.assertTrue(self.service_form(self.short, appointment_time="11:30").is_valid())
+
+        for form in (
+            self.booking_form(appointment_time="11:00"),
+            self.service_form(self.short, appointment_time="12:30"),
+        ):
+            self.assertFalse(form.is_valid())
+            self.assertEqual(
+                form.errors["appointment_time"],
+                ["Это время недоступно, выберите другое из списка"],
+            )
+
+
+class BookingOverlapTests(SalonFixture, TestCase):
+    """Пересекающиеся записи мастера отклоняются и моделью, и БД"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.booking = cls.make_booking(10)
+
+    def test_database_rejects_overlap(self):
+        booking = self.build_booking(10, minute=30)
+        booking.end_time = booking.calculate_end_time()
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Booking.objects.bulk_create([booking])
+
+    def test_clean_reports_overlap_instead_of_integrity_error(self):
+        other = self.make_booking(12)
+        # Перенос в занятое время, как в админке
+        other.appointment_time = time(10, 30)
+        with self.assertRaises(ValidationError):
+            other.full_clean()
+
+        # Соседнее время и сама запись пересечением не считаются
+        other.appointment_time = time(11, 0)
+        other.full_clean()
+        self.booking.full_clean()
+
+    def test_cancelled_booking_frees_time(self):
+        Booking.objects.filter(pk=self.booking.pk).update(status=Booking.Status.CANCELLED)
+        self.make_booking(10)
+
+
+class BookingSaveQueryTests(SalonFixture, TestCase):
+    """Сохранение записи без смены связей не загружает клиента, мастера и услугу"""
+
+    CLIENT_EMAIL = "client@example.com"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.booking = cls.make_booking(10)
+
+    def test_unchanged_relations_save(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.notes = "Без изменений связей"
+        # SAVEPOINT, UPDATE, RELEASE
+        with self.assertNumQueries(3):
+            booking.save()
+
+    def test_status_only_save(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.status = Booking.Status.CONFIRMED
+        # SAVEPOINT, UPDATE, история, строка для письма, письмо в outbox, RELEASE
+        with self.assertNumQueries(6):
+            booking.save()
+
+
+class BookingStatusTransitionTests(SalonFixture, TestCase):
+    """Смена статусов подчиняется таблице Booking.TRANSITIONS"""
+
+    SERVICE_DURATION = 30
+
+    def test_single_save_rejects_illegal_transition(self):
+        booking = self.make_booking(10, Booking.Status.COMPLETED)
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.status = Booking.Status.PENDING
+        with self.assertRaises(ValidationError):
+            booking.save()
+
+    def test_bulk_transition_skips_illegal_rows(self):
+        pending = self.make_booking(10)
+        confirmed = self.make_booking(11, Booking.Status.CONFIRMED)
+        completed = self.make_booking(12, Booking.Status.COMPLETED)
+
+        with self.assertNumQueries(6):  # Включая SAVEPOINT и RELEASE
+            updated, skipped = Booking.objects.transition(
+                Booking.objects.all(), Booking.Status.CONFIRMED, user=self.staff
+            )
+
+        self.assertEqual((updated, skipped), (1, 1))
+        statuses = dict(Booking.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[pending.pk], Booking.Status.CONFIRMED)
+        self.assertEqual(statuses[confirmed.pk], Booking.Status.CONFIRMED)
+        self.assertEqual(statuses[completed.pk], Booking.Status.COMPLETED)
+        self.assertEqual(
+            list(BookingHistory.objects.values_list("booking_id", flat=True)), [pending.pk]
+        )
+
+    def test_bulk_transition_queries_do_not_depend_on_size(self):
+        self.client_user.email = "client@example.com"
+        self.client_user.save()
+        bookings = [
+            self.build_booking(
+                8 + minute // 60,
+                Booking.Status.COMPLETED if index % 5 == 4 else Booking.Status.CONFIRMED,
+                minute=minute % 60,
+                end_time=time(8 + (minute + 30) // 60, (minute + 30) % 60),
+            )
+            for index, minute in enumerate(range(0, 24 * 30, 30))
+        ]
+        small = Booking.objects.bulk_create(bookings[:4])
+        large = Booking.objects.bulk_create(bookings[4:])
+
+        def cancel(batch):
+            with CaptureQueriesContext(connection) as queries:
+                result = Booking.objects.transition(
+                    Booking.objects.filter(pk__in=[b.pk for b in batch]), Booking.Status.CANCELLED
+                )
+            return result, len(queries)
+
+        small_result, small_queries = cancel(small)
+        large_result, large_queries = cancel(large)
+
+        # Завершённые записи отменить нельзя - они попадают в skipped
+        self.assertEqual(small_result, (4, 0))
+        self.assertEqual(large_result, (16, 4))
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(OutboxMessage.objects.count(), 20)
+
+
+class ComboBookingTests(SalonFixture, TestCase):
+    """Запись на несколько услуг подряд создаётся целиком или не создаётся"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        colouring = ServiceCategory.objects.create(name="Окрашивание")
+        cls.colouring = Service.objects.create(
+            category=colouring, name="Окрашивание", duration_minutes=90, price=3000
+        )
+        cls.colourist = User.objects.create(
+            username="colourist", role=User.Roles.STAFF, specialization=colouring
+        )
+        WorkingHours.objects.create(
+            staff=cls.colourist,
+            day_of_week=cls.date.weekday(),
+            start_time=time(10, 0),
+            end_time=time(18, 0),
+        )
+
+    def post_combo(self, **extra):
+        self.client.force_login(self.client_user)
+        data = {
+            "service": [self.service.pk, self.colouring.pk],
+            "date": self.date.isoformat(),
+            **extra,
+        }
+        return self.client.post(reverse("bookings:api_combo_booking"), data)
+
+    def test_consecutive_slots_with_different_masters(self):
+        response = self.post_combo(time="10:00")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(row["staff"], row["time"], row["end_time"]) for row in response.json()],
+            [(self.staff.pk, "10:00", "11:00"), (self.colourist.pk, "11:00", "12:30")],
+        )
+
+    def test_conflict_rolls_back_whole_combo(self):
+        self.make_booking(11, minute=30, staff=self.colourist, service=self.colouring)
+
+        response = self.post_combo(time="10:00")
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_earliest_start_when_time_not_given(self):
+        self.make_booking(10)
+
+        response = self.post_combo()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row["time"] for row in response.json()], ["11:00", "12:00"])
+
+
+class IdempotentSubmissionTests(SalonFixture, TestCase):
+    """Повторная отправка формы с тем же токеном не создаёт вторую запись"""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.client_user)
+
+    def submit(self, token, hour=10):
+        return self.client.post(
+            reverse("bookings:create_booking"),
+            {
+                "service": self.service.pk,
+                "staff": self.staff.pk,
+                "appointment_date": self.date.isoformat(),
+                "appointment_time": f"{hour}:00",
+                "submission_token": token,
+            },
+        )
+
+    def test_repeated_post_returns_first_result(self):
+        first = self.submit("token-1")
+        with self.assertNumQueries(2):  # Сессия и пользователь, без таблицы записей
+            second = self.submit("token-1", hour=12)
+
+        self.assertRedirects(first, reverse("bookings:my_bookings"), fetch_redirect_response=False)
+        self.assertRedirects(second, reverse("bookings:my_bookings"), fetch_redirect_response=False)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_replay_survives_cache_reset(self):
+        self.submit("token-1")
+        cache.clear()
+        self.submit("token-1", hour=12)
+
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_token_released_after_invalid_form(self):
+        response = self.submit("token-1", hour=9)  # До начала рабочего дня
+        self.assertEqual(response.status_code, 200)
+
+        self.submit("token-1")
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_token_released_after_failure(self):
+        with mock.patch("bookings.services.create_booking", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.submit("token-1")
+
+        self.submit("token-1")
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_abandoned_token_can_be_claimed_again(self):
+        self.assertIsNone(idempotency.claim(self.client_user.pk, "token-1"))
+        self.assertTrue(idempotency.claim(self.client_user.pk, "token-1").pending)
+
+        # Процесс упал, не освободив токен: запись в кеше истекла, в БД - устарела
+        cache.clear()
+        BookingSubmission.objects.update(
+            created_at=timezone.now() - timedelta(seconds=idempotency.PENDING_TTL + 1)
+        )
+        self.assertIsNone(idempotency.claim(self.client_user.pk, "token-1"))
+        self.assertTrue(idempotency.claim(self.client_user.pk, "token-1").pending)
+
+
+class FailingEmailBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP недоступен")
+
+
+class OutboxTests(SalonFixture, TestCase):
+    """Уведомления пишутся в очередь вместе с записью и отправляются пачками"""
+
+    CLIENT_EMAIL = "client@example.com"
+
+    def test_booking_changes_are_queued(self):
+        first = self.make_booking(10)
+        self.make_booking(12)
+        Booking.objects.transition(Booking.objects.all(), Booking.Status.CONFIRMED)
+
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("booking_id", "event")),
+            [
+                (first.pk, "created"),
+                (first.pk + 1, "created"),
+                (first.pk, "confirmed"),
+                (first.pk + 1, "confirmed"),
+            ],
+        )
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_send_batch_over_one_connection(self):
+        self.make_booking(10)
+        self.make_booking(12)
+
+        self.assertEqual(outbox.send_batch(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["client@example.com"])
+        self.assertIn("Стрижка", mail.outbox[0].body)
+        self.assertFalse(OutboxMessage.objects.exclude(status=OutboxMessage.Status.SENT).exists())
+
+    def test_failed_send_is_retried_later(self):
+        self.make_booking(10)
+
+        self.assertEqual(outbox.send_batch(connection=FailingEmailBackend()), (0, 1))
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, OutboxMessage.Status.PENDING)
+        self.assertEqual(message.attempts, 1)
+        # Повторная попытка - только после паузы
+        self.assertEqual(outbox.send_batch(), (0, 0))
+
+
+class ReminderTests(SalonFixture, TestCase):
+    """Напоминание о подтверждённой записи ставится в очередь один раз"""
+
+    DAYS_AHEAD = 2
+    CLIENT_EMAIL = "client@example.com"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # За сутки до записи на 10:00 - напоминание о ней, но не о записи на 14:00
+        cls.now = timezone.make_aware(datetime.combine(cls.date - timedelta(days=1), time(12, 0)))
+
+    def reminded(self):
+        return list(
+            OutboxMessage.objects.filter(event="reminder").values_list("booking_id", flat=True)
+        )
+
+    def test_due_reminders_are_queued_once(self):
+        morning = self.make_booking(10, Booking.Status.CONFIRMED)
+        self.make_booking(11)
+        self.make_booking(14, Booking.Status.CONFIRMED)
+
+        self.assertEqual(reminders.send_reminders(now=self.now, chunk_size=1), 1)
+        self.assertEqual(reminders.send_reminders(now=self.now), 0)
+        self.assertEqual(self.reminded(), [morning.pk])
+
+    def test_moved_booking_is_reminded_again(self):
+        booking = self.make_booking(10, Booking.Status.CONFIRMED)
+        reminders.send_reminders(now=self.now)
+
+        booking = Booking.objects.get(pk=booking.pk)
+        booking.appointment_time = time(9, 0)
+        booking.save()
+
+        self.assertEqual(reminders.send_reminders(now=self.now), 1)
+        self.assertEqual(self.reminded(), [booking.pk, booking.pk])
+
+
+class SweepTests(SalonFixture, TestCase):
+    """Просроченные неподтверждённые записи отменяются, прошедшие ждут отметки"""
+
+    def test_expired_pending_frees_slot(self):
+        stale = [self.make_booking(hour) for hour in (10, 11, 12)]
+        fresh = self.make_booking(13)
+        Booking.objects.filter(pk__in=[b.pk for b in stale]).update(
+            created_at=timezone.now() - timedelta(hours=sweeps.PENDING_TTL_HOURS + 1)
+        )
+        self.assertFalse(availability.is_staff_available(self.staff, self.date, time(10, 0), 60))
+
+        self.assertEqual(sweeps.expire_pending(batch_size=2), 3)
+
+        statuses = dict(Booking.objects.values_list("pk", "status"))
+        self.assertEqual({statuses[b.pk] for b in stale}, {Booking.Status.CANCELLED})
+        self.assertEqual(statuses[fresh.pk], Booking.Status.PENDING)
+        self.assertEqual(BookingHistory.objects.filter(action="cancelled").count(), 3)
+        self.assertTrue(availability.is_staff_available(self.staff, self.date, time(10, 0), 60))
+
+    def test_past_confirmed_left_for_review(self):
+        past = self.make_booking(
+            10, Booking.Status.CONFIRMED, day=timezone.localdate() - timedelta(days=3)
+        )
+        self.make_booking(10, Booking.Status.CONFIRMED)
+        out = StringIO()
+
+        call_command("sweep_bookings", stdout=out)
+
+        # Статус не меняется и письмо о неявке не уходит - визит отмечает администратор
+        self.assertEqual(list(sweeps.unresolved_past()), [past])
+        self.assertEqual(Booking.objects.get(pk=past.pk).status, Booking.Status.CONFIRMED)
+        self.assertFalse(OutboxMessage.objects.filter(event=Booking.Status.NO_SHOW).exists())
+        self.assertIn("ждут отметки о визите: 1", out.getvalue())
+
+    def test_no_show_can_be_corrected(self):
+        booking = self.make_booking(
+            10, Booking.Status.CONFIRMED, day=timezone.localdate() - timedelta(days=3)
+        )
+        booking.status = Booking.Status.NO_SHOW
+        booking.save()
+
+        booking.status = Booking.Status.COMPLETED
+        booking.save()
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, Booking.Status.COMPLETED)
+
+
+class ArchiveTests(SalonFixture, TestCase):
+    """Давние завершённые записи переносятся в архив вместе с историей и отзывом"""
+
+    def finish(self, day, status):
+        """Запись в день day, проведённая через подтверждение в статус status"""
+        booking = self.make_booking(day=day)
+        Booking.objects.transition(Booking.objects.filter(pk=booking.pk), Booking.Status.CONFIRMED)
+        Booking.objects.transition(Booking.objects.filter(pk=booking.pk), status)
+        return booking
+
+    def test_archive_moves_final_bookings(self):
+        old_day = timezone.localdate() - timedelta(days=archive.ARCHIVE_AFTER_DAYS + 10)
+        completed = self.finish(old_day, Booking.Status.COMPLETED)
+        Review.objects.create(booking=completed, rating=5, comment="Отлично")
+        cancelled = self.finish(old_day + timedelta(days=1), Booking.Status.CANCELLED)
+        recent = self.finish(timezone.localdate() - timedelta(days=1), Booking.Status.COMPLETED)
+
+        self.assertEqual(archive.archive(chunk_size=1), 2)
+
+        self.assertEqual(list(Booking.objects.values_list("pk", flat=True)), [recent.pk])
+        archived = BookingArchive.objects.get(pk=completed.pk)
+        self.assertEqual(archived.review.rating, 5)
+        self.assertEqual(
+            set(archived.history.values_list("action", flat=True)), {"confirmed", "completed"}
+        )
+        self.assertIsNone(BookingArchive.objects.get(pk=cancelled.pk).review)
+
+    def test_my_bookings_shows_archive_on_demand(self):
+        old_day = timezone.localdate() - timedelta(days=archive.ARCHIVE_AFTER_DAYS + 10)
+        self.finish(old_day, Booking.Status.COMPLETED)
+        archive.archive()
+        self.client.force_login(self.client_user)
+
+        response = self.client.get(reverse("bookings:my_bookings"))
+        self.assertEqual([s["name"] for s in response.context["sections"]], ["upcoming", "past"])
+
+        response = self.client.get(reverse("bookings:my_bookings"), {"archive": 1})
+        self.assertEqual(len(response.context["sections"][2]["bookings"]), 1)
+        self.assertContains(response, "В архиве")
+
+
+class WaitlistTests(SalonFixture, TestCase):
+    """Отменённое время предлагается первому подходящему ждущему"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.waiters = [
+            User.objects.create(
+                username=f"waiter{i}", role=User.Roles.CLIENT, email=f"waiter{i}@example.com"
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.booking = self.make_booking(10)
+
+    def wait(self, client, **window):
+        entry = WaitlistEntry(
+            client=client,
+            service=self.service,
+            date_from=self.date,
+            date_to=self.date + timedelta(days=3),
+            **window,
+        )
+        entry.save()
+        return entry
+
+    def test_cancel_offers_slot_to_first_matching_waiter(self):
+        late = self.wait(self.waiters[0], time_from=time(14, 0))
+        first = self.wait(self.waiters[1])
+        second = self.wait(self.waiters[2])
+
+        self.booking.status = Booking.Status.CANCELLED
+        self.booking.save()
+
+        statuses = dict(WaitlistEntry.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[late.pk], WaitlistEntry.Status.WAITING)
+        self.assertEqual(statuses[first.pk], WaitlistEntry.Status.OFFERED)
+        self.assertEqual(statuses[second.pk], WaitlistEntry.Status.WAITING)
+        offer = OutboxMessage.objects.get(event="waitlist_offer")
+        self.assertEqual(offer.recipient, "waiter1@example.com")
+
+    def test_bulk_cancel_offers_slot(self):
+        entry = self.wait(self.waiters[0], time_to=time(11, 0))
+
+        Booking.objects.transition(
+            Booking.objects.filter(pk=self.booking.pk), Booking.Status.CANCELLED
+        )
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, WaitlistEntry.Status.OFFERED)
+        self.assertEqual((entry.offered_date, entry.offered_time), (self.date, time(10, 0)))
+
+    def offered_to(self):
+        return list(
+            WaitlistEntry.objects.filter(status=WaitlistEntry.Status.OFFERED).values_list(
+                "client__username", flat=True
+            )
+        )
+
+    def cancel(self):
+        self.booking.status = Booking.Status.CANCELLED
+        self.booking.save()
+
+    def test_expired_offer_passes_to_next_waiter(self):
+        first = self.wait(self.waiters[0])
+        self.wait(self.waiters[1])
+        self.cancel()
+        self.assertEqual(waitlist.expire_offers(), 0)
+
+        WaitlistEntry.objects.filter(pk=first.pk).update(
+            offered_at=timezone.now() - timedelta(hours=waitlist.OFFER_TTL_HOURS + 1)
+        )
+        out = StringIO()
+        call_command("sweep_bookings", stdout=out)
+
+        self.assertIn("Истекло предложений листа ожидания: 1", out.getvalue())
+        self.assertEqual(WaitlistEntry.objects.get(pk=first.pk).status, WaitlistEntry.Status.EXPIRED)
+        self.assertEqual(self.offered_to(), ["waiter1"])
+        self.assertEqual(
+            list(OutboxMessage.objects.filter(event="waitlist_offer").values_list("recipient", flat=True)),
+            ["waiter0@example.com", "waiter1@example.com"],
+        )
+
+    def test_declined_offer_passes_to_next_waiter(self):
+        first = self.wait(self.waiters[0])
+        self.wait(self.waiters[1])
+        self.cancel()
+        self.client.force_login(self.waiters[0])
+
+        url = reverse("bookings:decline_waitlist_offer", args=[first.pk])
+        self.assertContains(self.client.get(reverse("bookings:my_bookings")), url)
+        response = self.client.post(url)
+
+        self.assertRedirects(response, reverse("bookings:my_bookings"), fetch_redirect_response=False)
+        first.refresh_from_db()
+        # Отказавшийся ждёт дальше на своём месте, время получает следующий
+        self.assertEqual(first.status, WaitlistEntry.Status.WAITING)
+        self.assertIsNone(first.offered_at)
+        self.assertEqual(self.offered_to(), ["waiter1"])
+        self.assertFalse(waitlist.decline(first))
+
+    def test_accepted_offer_is_closed(self):
+        first = self.wait(self.waiters[0])
+        self.wait(self.waiters[1])
+        self.cancel()
+        create_booking(self.waiters[0], self.staff, self.service, self.date, time(10, 0))
+
+        later = timezone.now() + timedelta(hours=waitlist.OFFER_TTL_HOURS + 1)
+        self.assertEqual(waitlist.expire_offers(now=later), 0)
+
+        self.assertEqual(WaitlistEntry.objects.get(pk=first.pk).status, WaitlistEntry.Status.CLOSED)
+        self.assertEqual(self.offered_to(), [])
+
+
+class MyBookingsPaginationTests(SalonFixture, TestCase):
+    """Предстоящие и прошедшие записи клиента выводятся постранично по ключу"""
+
+    SERVICE_DURATION = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        today = timezone.localdate()
+        rows = []
+        for offset in range(-25, 25):
+            booking = cls.build_booking(
+                10 if offset else 11, day=today + timedelta(days=offset if offset else 5)
+            )
+            booking.end_time = booking.calculate_end_time(30)
+            rows.append(booking)
+        Booking.objects.bulk_create(rows)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.client_user)
+
+    def collect(self, name):
+        """Пройти раздел name по всем страницам"""
+        url = reverse("bookings:my_bookings")
+        params, seen = {}, []
+        for _ in range(10):
+            response = self.client.get(url, params)
+            section = next(s for s in response.context["sections"] if s["name"] == name)
+            seen.extend(section["bookings"])
+            if not section["next_url"]:
+                return seen
+            params = QueryDict(section["next_url"].lstrip("?"))
+        self.fail("Курсор страницы не продвигается")
+
+    def test_streams_cover_all_bookings_in_order(self):
+        upcoming = self.collect("upcoming")
+        past = self.collect("past")
+
+        self.assertEqual(len(upcoming) + len(past), 50)
+        self.assertEqual(len(upcoming), 25)
+        keys = [(b.appointment_date, b.appointment_time, b.pk) for b in upcoming]
+        self.assertEqual(keys, sorted(keys))
+        keys = [(b.appointment_date, b.appointment_time, b.pk) for b in past]
+        self.assertEqual(keys, sorted(keys, reverse=True))
+
+
+class CatalogBootstrapTests(SalonFixture, TestCase):
+    """Страница записи получает дерево каталога одним кешируемым запросом"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Service.objects.create(
+            category=cls.category, name="Старая", duration_minutes=30, price=500, is_active=False
+        )
+
+    def test_tree_contains_active_services_and_staff(self):
+        response = self.client.get(reverse("bookings:api_catalog"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertEqual(
+            response.json()["categories"],
+            [{
+                "id": self.category.pk,
+                "name": "Стрижки",
+                "services": [{"id": self.service.pk, "name": "Стрижка", "duration": 60}],
+                "staff": [{"id": self.staff.pk, "name": "Анна"}],
+            }],
+        )
+
+    def test_versioned_url_is_cached_and_revalidated(self):
+        url = reverse("bookings:api_catalog")
+        response = self.client.get(url, {"v": catalog.version()})
+        self.assertIn("max-age", response["Cache-Control"])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+        # После изменения каталога прежний ETag больше не подходит
+        Service.objects.create(
+            category=self.category, name="Укладка", duration_minutes=30, price=700
+        )
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()["categories"][0]["services"]), 2)
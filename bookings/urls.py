@@ -8,7 +8,17 @@ urlpatterns = [
     path("my/", views.my_bookings, name="my_bookings"),
     path("create/", views.create_booking, name="create_booking"),
     path("cancel/<int:booking_id>/", views.cancel_booking, name="cancel_booking"),
+    path("waitlist/", views.join_waitlist, name="join_waitlist"),
+    path(
+        "waitlist/<int:entry_id>/decline/",
+        views.decline_waitlist_offer,
+        name="decline_waitlist_offer",
+    ),
     path("add-review/<int:booking_id>/", views.add_review, name="add_review"),
     path("api/staff/", views.api_staff_list, name="api_staff_list"),
     path("api/services/", views.api_services_list, name="api_services_list"),
+    path("api/catalog/", views.api_catalog, name="api_catalog"),
+    path("api/slots/", views.api_slots_list, name="api_slots_list"),
+    path("api/slots/earliest/", views.api_earliest_slots, name="api_earliest_slots"),
+    path("api/combo/", views.api_combo_booking, name="api_combo_booking"),
 ]
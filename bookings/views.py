@@ -1,32 +1,110 @@
+import hashlib
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max, Q
 from django.http import JsonResponse
-from .models import Booking
-from .forms import BookingForm, ReviewForm  
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST
+from .models import Booking, WaitlistEntry
+from .forms import BookingForm, ReviewForm, WaitlistForm, staff_label
+from . import archive, idempotency, services, waitlist
 from django.contrib import messages
-from users.models import User
-from services.models import Service
-from datetime import datetime
+from services import catalog
+from schedule import availability
+from schedule.models import WorkingHours, SpecialHours, SalonClosure
+from datetime import datetime, timedelta
 from django.utils import timezone
 
 
 
+# Записей на странице каждого раздела "Мои записи"
+MY_BOOKINGS_PAGE_SIZE = 20
+
+
+def _parse_cursor(value):
+    """Курсор страницы "ГГГГ-ММ-ДД_ччммсс_id" -> (date, time, id) или None"""
+    try:
+        day, moment, pk = value.split("_")
+        return (
+            datetime.strptime(day, "%Y-%m-%d").date(),
+            datetime.strptime(moment, "%H%M%S").time(),
+            int(pk),
+        )
+    except (AttributeError, ValueError):
+        return None
+
+
+def _cursor(booking):
+    return f"{booking.appointment_date:%Y-%m-%d}_{booking.appointment_time:%H%M%S}_{booking.pk}"
+
+
+def _keyset_page(queryset, cursor, descending=False, size=MY_BOOKINGS_PAGE_SIZE):
+    """Страница записей после курсора по ключу (дата, время, id).
+
+    Стоимость запроса не зависит от номера страницы: условие по ключу
+    использует индекс (client, appointment_date, appointment_time).
+    Возвращает (записи, курсор следующей страницы или None).
+    """
+    after = _parse_cursor(cursor)
+    if after:
+        day, moment, pk = after
+        op = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"appointment_date__{op}": day})
+            | Q(appointment_date=day, **{f"appointment_time__{op}": moment})
+            | Q(appointment_date=day, appointment_time=moment, **{f"pk__{op}": pk})
+        )
+    order = ("appointment_date", "appointment_time", "pk")
+    if descending:
+        order = tuple(f"-{field}" for field in order)
+    rows = list(queryset.order_by(*order)[:size + 1])
+    if len(rows) > size:
+        return rows[:size], _cursor(rows[size - 1])
+    return rows, None
+
+
+def _page_url(request, param, cursor):
+    query = request.GET.copy()
+    query[param] = cursor
+    return f"?{query.urlencode()}"
+
+
 @login_required
 def my_bookings(request):
-    """Записи клиента"""
+    """Записи клиента: предстоящие и прошедшие, постранично"""
+    now = timezone.localtime(timezone.now())
     bookings = Booking.objects.filter(client=request.user).select_related(
         'service', 'staff', 'review'
-    ).order_by(
-        "appointment_date", "appointment_time"
+    )
+    is_upcoming = Q(appointment_date__gt=now.date()) | Q(
+        appointment_date=now.date(), appointment_time__gt=now.time()
     )
 
-    # Текущая дата и время для проверки прошедших записей
-    from django.utils import timezone
+    sections = [
+        ("upcoming", "Предстоящие записи", bookings.filter(is_upcoming), False),
+        ("past", "Прошедшие записи", bookings.exclude(is_upcoming), True),
+    ]
+    # Давние записи хранятся в архиве и показываются по запросу
+    show_archive = bool(request.GET.get("archive"))
+    if show_archive:
+        sections.append(("archived", "Архив", archive.client_bookings(request.user), True))
+
     context = {
-        "bookings": bookings,
-        "today": timezone.now().date(),
-        "now_time": timezone.now().time()
+        "show_archive": show_archive,
+        "sections": [],
+        # Освободившееся время из листа ожидания: записаться или отказаться
+        "waitlist_offers": WaitlistEntry.objects.filter(
+            client=request.user, status=WaitlistEntry.Status.OFFERED
+        ).select_related("service", "offered_staff"),
     }
+    for param, title, queryset, descending in sections:
+        rows, next_cursor = _keyset_page(queryset, request.GET.get(param), descending)
+        context["sections"].append({
+            "name": param,
+            "title": title,
+            "bookings": rows,
+            "next_url": _page_url(request, param, next_cursor) if next_cursor else None,
+        })
     return render(request, "bookings/my_bookings.html", context)
 
 
@@ -38,21 +116,45 @@ def create_booking(request):
         return redirect('services:list')
 
     if request.method == "POST":
+        # Повторная отправка той же формы - сразу возвращаем прежний результат
+        token = request.POST.get(idempotency.FIELD_NAME)
+        replay = idempotency.claim(request.user.pk, token)
+        if replay is not None:
+            return idempotency.replay_response(request, replay)
+
         form = BookingForm(request.POST)
         # Устанавливаем client до валидации
         form.instance.client = request.user
 
-        if form.is_valid():
-            # Конвертируем время в правильный формат перед сохранением
-            time_str = form.cleaned_data['appointment_time']
-            form.instance.appointment_time = datetime.strptime(time_str, "%H:%M").time()
-
-            form.save()
-            messages.success(request, 'Запись успешно создана!')
-            return redirect('bookings:my_bookings')
+        try:
+            if form.is_valid():
+                # Конвертируем время в правильный формат перед сохранением
+                time_str = form.cleaned_data['appointment_time']
+                try:
+                    booking = services.create_booking(
+                        client=request.user,
+                        staff=form.cleaned_data['staff'],
+                        service=form.cleaned_data['service'],
+                        date=form.cleaned_data['appointment_date'],
+                        start_time=datetime.strptime(time_str, "%H:%M").time(),
+                    )
+                except services.BookingConflict as conflict:
+                    form.add_error(None, str(conflict))
+                else:
+                    idempotency.complete(request.user.pk, token, booking)
+                    messages.success(request, 'Запись успешно создана!')
+                    return redirect('bookings:my_bookings')
+        except Exception:
+            # Иначе повторная отправка получала бы "уже обрабатывается"
+            idempotency.release(request.user.pk, token)
+            raise
+        idempotency.release(request.user.pk, token)
     else:
         form = BookingForm()
-    return render(request, 'bookings/create_booking.html', {'form': form})
+    return render(request, 'bookings/create_booking.html', {
+        'form': form,
+        'catalog_version': catalog.version(),
+    })
 
 
 def cancel_booking(request, booking_id):
@@ -68,6 +170,10 @@ def cancel_booking(request, booking_id):
             messages.error(request, 'Эта запись уже отменена')
             return redirect('bookings:my_bookings')
 
+        if not booking.can_transition_to(Booking.Status.CANCELLED):
+            messages.error(request, 'Эту запись уже нельзя отменить')
+            return redirect('bookings:my_bookings')
+
         # Проверяем, что запись не в прошлом
         if booking.appointment_date < timezone.now().date() or \
             (booking.appointment_date == timezone.now().date() and \
@@ -85,6 +191,37 @@ def cancel_booking(request, booking_id):
     return redirect('bookings:my_bookings')
 
 
+@login_required
+def join_waitlist(request):
+    """Заявка в лист ожидания: письмо придёт, когда нужное время освободится"""
+    if request.user.role != 'client':
+        messages.error(request, 'Только клиенты могут вставать в лист ожидания')
+        return redirect('services:list')
+
+    if request.method == "POST":
+        form = WaitlistForm(request.POST)
+        form.instance.client = request.user
+        if form.is_valid():
+            form.save()
+            messages.success(request, 'Мы сообщим вам, когда освободится подходящее время')
+            return redirect('bookings:my_bookings')
+    else:
+        form = WaitlistForm(initial={'service': request.GET.get('service')})
+    return render(request, 'bookings/join_waitlist.html', {'form': form})
+
+
+@login_required
+@require_POST
+def decline_waitlist_offer(request, entry_id):
+    """Отказ от предложенного времени - его сразу получает следующий в очереди"""
+    entry = WaitlistEntry.objects.filter(pk=entry_id, client=request.user).first()
+    if entry is None or not waitlist.decline(entry):
+        messages.error(request, 'Предложение уже не действует')
+    else:
+        messages.success(request, 'Мы сообщим, когда освободится другое подходящее время')
+    return redirect('bookings:my_bookings')
+
+
 @login_required
 def add_review(request, booking_id):
     """Добавление отзыва о записи"""
@@ -125,39 +262,275 @@ def add_review(request, booking_id):
 
 def api_services_list(request):
     """API для получения списка услуг по категории"""
+    snapshot = catalog.snapshot()
     category_id = request.GET.get('category')
-    
+
     if category_id:
         try:
-            from services.models import ServiceCategory
-            category = ServiceCategory.objects.get(pk=category_id)
-            # Возвращаем услуги этой категории
-            services = Service.objects.filter(category=category).values('id', 'name').order_by('name')
-        except ServiceCategory.DoesNotExist:
-            services = Service.objects.none()
+            category = snapshot.category_by_id.get(int(category_id))
+        except ValueError:
+            category = None
+        # Возвращаем услуги этой категории
+        services = snapshot.active_services(category.pk) if category else []
     else:
         # Если категория не указана, возвращаем все услуги
-        services = Service.objects.filter(is_active=True).values('id', 'name').order_by('name')
-    
-    return JsonResponse(list(services), safe=False)
+        services = snapshot.active_services()
+
+    return JsonResponse([{'id': service.pk, 'name': service.name} for service in services], safe=False)
 
 
 def api_staff_list(request):
     """API для получения списка мастеров"""
-    service_id = request.GET.get('service')
+    snapshot = catalog.snapshot()
+    service = snapshot.service(request.GET.get('service'), active_only=False)
 
-    if service_id:
-        try:
-            service = Service.objects.get(pk=service_id)
-            # Возвращаем мастеров, специализирующихся на категории услуги
-            staff = User.objects.filter(
-                role='staff',
-                specialization=service.category
-            ).values('id', 'first_name').order_by('first_name')
-        except Service.DoesNotExist:
-            staff = User.objects.filter(role='staff').values('id', 'first_name').order_by('first_name')
+    if service:
+        # Возвращаем мастеров, специализирующихся на категории услуги
+        staff = snapshot.staff_for(service.category_id)
     else:
-        # Если услуга не указана, возвращаем всех мастеров
-        staff = User.objects.filter(role='staff').values('id', 'first_name').order_by('first_name')
+        # Если услуга не указана или не найдена, возвращаем всех мастеров
+        staff = snapshot.staff_for()
+
+    return JsonResponse([{'id': user.pk, 'first_name': user.first_name} for user in staff], safe=False)
+
+
+def _catalog_etag(request):
+    return f"catalog-{catalog.version()}"
+
 
-    return JsonResponse(list(staff), safe=False)
+@condition(etag_func=_catalog_etag)
+def api_catalog(request):
+    """API с деревом каталога для страницы записи: категории -> услуги и мастера.
+
+    Ответ зависит только от версии каталога. Страница запрашивает его
+    с версией в URL (?v=), такой ответ браузер хранит без перепроверки;
+    без версии или со старой версией - только с проверкой по ETag.
+    """
+    snapshot = catalog.snapshot()
+    tree = {
+        "v": str(snapshot.version),
+        "categories": [
+            {
+                "id": category.pk,
+                "name": category.name,
+                "services": [
+                    {"id": service.pk, "name": service.name, "duration": service.duration_minutes}
+                    for service in snapshot.active_services(category.pk)
+                ],
+                # Мастера подбираются по специализации, общей для всех услуг категории
+                "staff": [
+                    {"id": user.pk, "name": staff_label(user)}
+                    for user in snapshot.staff_for(category.pk)
+                ],
+            }
+            for category in snapshot.active_categories()
+        ],
+    }
+    response = JsonResponse(
+        tree, json_dumps_params={"separators": (",", ":"), "ensure_ascii": False}
+    )
+    if request.GET.get("v") == str(snapshot.version):
+        patch_cache_control(response, public=True, max_age=catalog.CACHE_TIMEOUT, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+# Максимальный интервал дат, который можно запросить у api/slots/
+SLOTS_MAX_DAYS = 31
+
+
+def _parse_slots_request(request):
+    """Разбор параметров api/slots/ и расчёт ETag для условного GET.
+
+    Last-Modified не отдаётся: максимум updated_at не меняется при удалении
+    записей или выходных и при сдвиге текущего времени, а ETag учитывает
+    и количество строк, и время отсечки на сегодня.
+
+    Возвращает None, если параметры некорректны.
+    """
+    snapshot = catalog.snapshot()
+    service = snapshot.service(request.GET.get("service"))
+    if service is None:
+        return None
+    try:
+        today = timezone.localdate()
+        date_from = datetime.strptime(
+            request.GET.get("from") or today.isoformat(), "%Y-%m-%d"
+        ).date()
+        date_to = datetime.strptime(
+            request.GET.get("to") or date_from.isoformat(), "%Y-%m-%d"
+        ).date()
+    except (ValueError, TypeError):
+        return None
+    date_from = max(date_from, today)
+    date_to = min(date_to, date_from + timedelta(days=SLOTS_MAX_DAYS - 1))
+
+    staff_ids = sorted(user.pk for user in snapshot.staff_for(service.category_id))
+    if request.GET.get("staff"):
+        try:
+            staff_ids = [pk for pk in staff_ids if pk == int(request.GET["staff"])]
+        except ValueError:
+            return None
+
+    # Версия данных: последние изменения записей и расписания мастеров
+    bookings = Booking.objects.filter(
+        staff_id__in=staff_ids, appointment_date__range=(date_from, date_to)
+    ).aggregate(changed=Max("updated_at"), total=Count("id"))
+    working = WorkingHours.objects.filter(staff_id__in=staff_ids).aggregate(
+        changed=Max("updated_at"), total=Count("id")
+    )
+    special = SpecialHours.objects.filter(
+        staff_id__in=staff_ids, date__range=(date_from, date_to)
+    ).aggregate(changed=Max("updated_at"), total=Count("id"))
+    closures = SalonClosure.objects.filter(
+        date__range=(date_from, date_to)
+    ).aggregate(changed=Max("updated_at"), total=Count("id"))
+
+    version = [
+        service.pk, service.duration_minutes, staff_ids, date_from, date_to,
+        bookings, working, special, closures,
+    ]
+    if date_from == today:
+        # Слоты на сегодня зависят от текущего времени
+        version.append(timezone.localtime(timezone.now()).strftime("%H:%M"))
+
+    return {
+        "service": service,
+        "staff_ids": staff_ids,
+        "date_from": date_from,
+        "date_to": date_to,
+        "etag": hashlib.md5(repr(version).encode()).hexdigest(),
+    }
+
+
+def _slots_request(request):
+    """Параметры api/slots/ разбираются один раз за запрос"""
+    if not hasattr(request, "_slots_request"):
+        request._slots_request = _parse_slots_request(request)
+    return request._slots_request
+
+
+def _slots_etag(request):
+    params = _slots_request(request)
+    return params["etag"] if params else None
+
+
+@condition(etag_func=_slots_etag)
+def api_slots_list(request):
+    """API для получения свободных слотов: ?service=&staff=&from=&to="""
+    params = _slots_request(request)
+    if params is None:
+        return JsonResponse({"error": "Некорректные параметры запроса"}, status=400)
+
+    schedules = availability.load_day_schedules(
+        params["staff_ids"], params["date_from"], params["date_to"]
+    )
+    now = timezone.localtime(timezone.now())
+    duration = params["service"].duration_minutes
+    slots = [
+        {
+            "staff": staff_id,
+            "date": day.isoformat(),
+            "time": slot.strftime("%H:%M"),
+        }
+        for day in availability.daterange(params["date_from"], params["date_to"])
+        for staff_id in params["staff_ids"]
+        for slot in schedules[(staff_id, day)].free_slots(
+            duration, not_before=availability.not_before(day, now)
+        )
+    ]
+    return JsonResponse(slots, safe=False)
+
+
+def api_earliest_slots(request):
+    """API для поиска ближайшего времени у любого мастера: ?service=&limit=&days="""
+    snapshot = catalog.snapshot()
+    service = snapshot.service(request.GET.get("service"))
+    try:
+        limit = min(int(request.GET.get("limit", 5)), 50)
+        days = min(int(request.GET.get("days", availability.SEARCH_HORIZON_DAYS)), 90)
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "Некорректные параметры запроса"}, status=400)
+    if service is None:
+        return JsonResponse({"error": "Некорректные параметры запроса"}, status=400)
+
+    staff_names = {
+        user.pk: user.first_name
+        for user in sorted(snapshot.staff_for(service.category_id), key=lambda user: user.pk)
+    }
+    slots = availability.earliest_slots(
+        service, limit=limit, horizon_days=days, staff_ids=list(staff_names)
+    )
+    return JsonResponse(
+        [
+            {
+                "staff": staff_id,
+                "staff_name": staff_names[staff_id],
+                "date": day.isoformat(),
+                "time": slot.strftime("%H:%M"),
+            }
+            for day, slot, staff_id in slots
+        ],
+        safe=False,
+    )
+
+
+# Максимальное количество услуг в одной комплексной записи
+COMBO_MAX_SERVICES = 5
+
+
+@login_required
+@require_POST
+def api_combo_booking(request):
+    """API для записи на несколько услуг подряд: POST service=&service=&date=&time=&staff=
+
+    Все записи создаются одной транзакцией: если время хотя бы одной услуги
+    занято, не создаётся ни одна (ответ 409).
+    """
+    if request.user.role != "client":
+        return JsonResponse({"error": "Только клиенты могут создавать записи"}, status=403)
+
+    try:
+        service_ids = [int(pk) for pk in request.POST.getlist("service")]
+        date = datetime.strptime(request.POST.get("date", ""), "%Y-%m-%d").date()
+        start_time = (
+            datetime.strptime(request.POST["time"], "%H:%M").time()
+            if request.POST.get("time") else None
+        )
+        staff_ids = [int(pk) for pk in request.POST.getlist("staff")] or None
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "Некорректные параметры запроса"}, status=400)
+
+    snapshot = catalog.snapshot()
+    found = {service.pk: service for service in map(snapshot.service, service_ids) if service}
+    if not 0 < len(service_ids) <= COMBO_MAX_SERVICES or len(found) != len(set(service_ids)):
+        return JsonResponse({"error": "Некорректные параметры запроса"}, status=400)
+    if date < timezone.localdate():
+        return JsonResponse({"error": "Нельзя записаться на прошедшую дату"}, status=400)
+
+    plan = availability.combo_plan(
+        [found[pk] for pk in service_ids], date, start_time=start_time, staff_ids=staff_ids
+    )
+    try:
+        if plan is None:
+            raise services.BookingConflict()
+        bookings = services.create_combo_booking(request.user, date, plan)
+    except services.BookingConflict as conflict:
+        return JsonResponse({"error": str(conflict)}, status=409)
+
+    return JsonResponse(
+        [
+            {
+                "id": booking.pk,
+                "service": booking.service_id,
+                "staff": booking.staff_id,
+                "date": booking.appointment_date.isoformat(),
+                "time": booking.appointment_time.strftime("%H:%M"),
+                "end_time": booking.end_time.strftime("%H:%M"),
+            }
+            for booking in bookings
+        ],
+        safe=False,
+        status=201,
+    )
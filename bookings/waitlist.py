@@ -0,0 +1,241 @@
+"""Лист ожидания: освободившееся время предлагается ждущим клиентам.
+
+Когда запись отменяется (клиентом, администратором или автоматически),
+открытые заявки на освободившиеся дни находятся одним запросом по частичному
+индексу (категория, даты) и перебираются в порядке очереди. Первой подходящей
+заявке (мастер, окно времени, длительность услуги помещается в расписание)
+отправляется письмо через очередь уведомлений.
+
+Предложение действует WAITLIST_OFFER_TTL_HOURS. Если клиент отказался или не
+записался за это время, время предлагается следующему в очереди
+(expire_offers() запускается из manage.py sweep_bookings).
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from schedule import availability
+from users.models import User
+from . import notifications
+from .models import Booking, OutboxMessage, WaitlistEntry
+from .signals import bookings_transitioned
+
+
+OFFER_TTL_HOURS = getattr(settings, "WAITLIST_OFFER_TTL_HOURS", 2)
+
+
+def waiting_entries(category_ids, staff_ids, date_from, date_to):
+    """Открытые заявки категорий category_ids на дни из [date_from, date_to] в порядке очереди"""
+    return (
+        WaitlistEntry.objects.filter(
+            status=WaitlistEntry.Status.WAITING,
+            category_id__in=category_ids,
+            date_from__lte=date_to,
+            date_to__gte=date_from,
+        )
+        .filter(Q(staff__isnull=True) | Q(staff_id__in=staff_ids))
+        .select_related("client", "service")
+        .order_by("created_at", "id")
+    )
+
+
+def matches(entry, category_id, staff_id, day, start_time):
+    """Подходит ли заявке время мастера staff_id в day с start_time"""
+    return (
+        entry.category_id == category_id
+        and entry.date_from <= day <= entry.date_to
+        and entry.staff_id in (None, staff_id)
+        and (entry.time_from is None or entry.time_from <= start_time)
+    )
+
+
+def offer_freed_slots(freed, exclude=()):
+    """Предложить освободившееся время ждущим.
+
+    freed - записи (словари с staff_id, appointment_date, appointment_time).
+    exclude - заявки, которым это время уже предлагали.
+    Возвращает количество отправленных предложений.
+    """
+    freed = [row for row in freed if row["appointment_date"] >= timezone.localdate()]
+    if not freed:
+        return 0
+    staff = {
+        row["id"]: row
+        for row in User.objects.filter(
+            pk__in={row["staff_id"] for row in freed}, specialization__isnull=False
+        ).values("id", "first_name", "specialization_id")
+    }
+    freed = [row for row in freed if row["staff_id"] in staff]
+    if not freed:
+        return 0
+    # Расписание читаем из БД: кеш этих дней мог ещё не сброситься
+    schedules = availability.load_from_db(
+        staff,
+        min(row["appointment_date"] for row in freed),
+        max(row["appointment_date"] for row in freed),
+    )
+    # Заявки на все дни одним запросом, а не по запросу на каждую запись
+    entries = list(
+        waiting_entries(
+            {row["specialization_id"] for row in staff.values()},
+            staff,
+            min(row["appointment_date"] for row in freed),
+            max(row["appointment_date"] for row in freed),
+        ).exclude(pk__in=exclude)
+    )
+    now = timezone.localtime(timezone.now())
+
+    offered = set()
+    for row in freed:
+        staff_id, day, start_time = row["staff_id"], row["appointment_date"], row["appointment_time"]
+        if availability.to_minutes(start_time) < availability.not_before(day, now):
+            continue
+        schedule = schedules[(staff_id, day)]
+        category_id = staff[staff_id]["specialization_id"]
+        for entry in entries:
+            if entry.pk in offered or not matches(entry, category_id, staff_id, day, start_time):
+                continue
+            duration = entry.service.duration_minutes
+            end_time = (datetime.combine(day, start_time) + timedelta(minutes=duration)).time()
+            if entry.time_to and (end_time > entry.time_to or end_time < start_time):
+                continue
+            if not schedule.fits(availability.to_minutes(start_time), duration):
+                continue
+            offer(entry, staff[staff_id], day, start_time)
+            offered.add(entry.pk)
+            break
+    return len(offered)
+
+
+def offer(entry, staff, day, start_time):
+    """Отметить заявку и поставить письмо с предложением в очередь"""
+    WaitlistEntry.objects.filter(pk=entry.pk).update(
+        status=WaitlistEntry.Status.OFFERED,
+        offered_date=day,
+        offered_time=start_time,
+        offered_staff_id=staff["id"],
+        offered_at=timezone.now(),
+    )
+    OutboxMessage.enqueue(
+        [
+            {
+                "pk": None,
+                "client__email": entry.client.email,
+                "client__first_name": entry.client.first_name,
+                "staff__first_name": staff["first_name"],
+                "service__name": entry.service.name,
+                "appointment_date": day,
+                "appointment_time": start_time,
+            }
+        ],
+        notifications.WAITLIST_OFFER,
+    )
+
+
+def _offered_slots(rows):
+    return [
+        {
+            "staff_id": row["offered_staff_id"],
+            "appointment_date": row["offered_date"],
+            "appointment_time": row["offered_time"],
+        }
+        for row in rows
+        if row["offered_staff_id"]
+    ]
+
+
+def decline(entry):
+    """Клиент отказался от предложенного времени.
+
+    Заявка снова ждёт на своём месте в очереди, а время предлагается следующему.
+    Возвращает False, если предложение уже не действует.
+    """
+    rows = list(
+        WaitlistEntry.objects.filter(pk=entry.pk, status=WaitlistEntry.Status.OFFERED).values(
+            "offered_staff_id", "offered_date", "offered_time"
+        )
+    )
+    updated = WaitlistEntry.objects.filter(
+        pk=entry.pk, status=WaitlistEntry.Status.OFFERED
+    ).update(
+        status=WaitlistEntry.Status.WAITING,
+        offered_date=None,
+        offered_time=None,
+        offered_staff=None,
+        offered_at=None,
+    )
+    if not updated:
+        return False
+    offer_freed_slots(_offered_slots(rows), exclude=[entry.pk])
+    return True
+
+
+def expire_offers(now=None, ttl_hours=OFFER_TTL_HOURS):
+    """Закрыть предложения старше ttl_hours и передать время следующим в очереди.
+
+    Заявка, клиент которой записался на предложенное время, закрывается,
+    остальные получают статус "Предложение истекло". Возвращает их число.
+    """
+    now = now or timezone.now()
+    booked = Booking.objects.active().filter(
+        client_id=OuterRef("client_id"),
+        staff_id=OuterRef("offered_staff_id"),
+        appointment_date=OuterRef("offered_date"),
+        appointment_time=OuterRef("offered_time"),
+    )
+    rows = list(
+        WaitlistEntry.objects.filter(
+            status=WaitlistEntry.Status.OFFERED,
+            offered_at__lt=now - timedelta(hours=ttl_hours),
+        )
+        .annotate(booked=Exists(booked))
+        .values("id", "booked", "offered_staff_id", "offered_date", "offered_time")
+    )
+    if not rows:
+        return 0
+    WaitlistEntry.objects.filter(
+        pk__in=[row["id"] for row in rows if row["booked"]]
+    ).update(status=WaitlistEntry.Status.CLOSED)
+    expired = [row for row in rows if not row["booked"]]
+    WaitlistEntry.objects.filter(
+        pk__in=[row["id"] for row in expired], status=WaitlistEntry.Status.OFFERED
+    ).update(status=WaitlistEntry.Status.EXPIRED)
+    offer_freed_slots(_offered_slots(expired))
+    return len(expired)
+
+
+@receiver(post_save, sender=Booking)
+def offer_after_cancel(sender, instance, created, **kwargs):
+    """Клиент отменил запись - предлагаем время ждущим"""
+    original = getattr(instance, "_original", None)
+    if (
+        not created
+        and original
+        and instance.status == Booking.Status.CANCELLED
+        and original["status"] != Booking.Status.CANCELLED
+    ):
+        offer_freed_slots(
+            [
+                {
+                    "staff_id": original["staff_id"],
+                    "appointment_date": original["appointment_date"],
+                    "appointment_time": original["appointment_time"],
+                }
+            ]
+        )
+
+
+@receiver(bookings_transitioned)
+def offer_after_bulk_cancel(sender, bookings, status, **kwargs):
+    """Массовая отмена (администратор, истёкшие неподтверждённые записи)"""
+    if status != Booking.Status.CANCELLED:
+        return
+    offer_freed_slots(
+        Booking.objects.filter(pk__in=[pk for pk, _, _ in bookings])
+        .order_by("appointment_date", "appointment_time")
+        .values("staff_id", "appointment_date", "appointment_time")
+    )
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 
@@ -87,10 +88,54 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Транзакции сразу берут блокировку записи (BEGIN IMMEDIATE),
+            # чтобы создание записей не гонялось, см. bookings.services
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Кеш должен быть общим для всех процессов и серверов: в нём лежат версии
+# каталога и расписания мастеров (services.catalog, schedule.cache), счётчики
+# которых меняются через add/incr. Задайте CACHE_BACKEND/CACHE_LOCATION
+# (Redis или Memcached - у них incr атомарный). Без них в DEBUG используется
+# LocMemCache одного процесса runserver, иначе - DatabaseCache (таблица
+# создаётся командой createcachetable). LocMemCache и файловый кеш для
+# продакшена не подходят, см. проверку services.W001.
+if os.getenv('CACHE_BACKEND'):
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ['CACHE_BACKEND'],
+            'LOCATION': os.getenv('CACHE_LOCATION', ''),
+        }
+    }
+elif DEBUG:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', 'salon_cache'),
+        }
+    }
+
+# Тесты сбрасывают кеш (cache.clear()) - у них свой кеш в памяти процесса,
+# чтобы не стирать и не читать кеш запущенного на этой машине сайта
+if 'test' in sys.argv[1:2]:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'salon-tests-{os.getpid()}',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -151,3 +196,17 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 
 # Настройки для сброса пароля
 PASSWORD_RESET_TIMEOUT = 259200  # 3 дня в секундах
+
+# Настройки записи
+BOOKING_SLOT_STEP_MINUTES = int(os.getenv('BOOKING_SLOT_STEP_MINUTES', 30))  # Шаг сетки слотов
+SCHEDULE_CACHE_TIMEOUT = 60 * 60  # Время жизни кеша расписания мастера на день
+STAFF_DAY_HORIZON_DAYS = 90  # На сколько дней вперёд строится календарь мастеров
+BOOKING_SUBMISSION_TTL = 24 * 60 * 60  # Сколько помнить токен отправки формы записи
+NOTIFICATION_MAX_ATTEMPTS = 5  # Попыток отправки письма из очереди уведомлений
+BOOKING_REMINDER_LEAD_HOURS = 24  # За сколько часов до записи отправляется напоминание
+BOOKING_PENDING_TTL_HOURS = 24  # Через сколько часов отменяется неподтверждённая запись
+BOOKING_NO_SHOW_GRACE_HOURS = 24  # Через сколько часов после записи неотмеченный визит ждёт проверки
+BOOKING_ARCHIVE_AFTER_DAYS = 365  # Через сколько дней завершённые записи переносятся в архив
+WAITLIST_OFFER_TTL_HOURS = 2  # Сколько часов предложение из листа ожидания ждёт ответа клиента
+PROFILE_CACHE_TIMEOUT = 10 * 60  # Время жизни кеша сводки личного кабинета
+CATALOG_CACHE_TIMEOUT = 24 * 60 * 60  # Время жизни кеша каталога услуг (сбрасывается при изменении)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import SimpleListFilter
 from users.models import User
-from .models import WorkingHours, SpecialHours
+from .models import WorkingHours, SpecialHours, SalonClosure, StaffDay
 
 
 class ScheduleStaffFilter(SimpleListFilter):
@@ -59,3 +59,25 @@ class SpecialHoursAdmin(admin.ModelAdmin):
         if db_field.name == "staff":
             kwargs["queryset"] = User.objects.filter(role='staff')
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(SalonClosure)
+class SalonClosureAdmin(admin.ModelAdmin):
+    list_display = ("date", "start_time", "end_time", "note")
+    search_fields = ("note",)
+    date_hierarchy = "date"
+
+
+@admin.register(StaffDay)
+class StaffDayAdmin(admin.ModelAdmin):
+    """Календарь мастеров только для просмотра: строится из рабочих и особых часов"""
+    list_display = ("staff", "date", "start_time", "end_time", "is_day_off")
+    list_filter = ("is_day_off", ScheduleStaffFilter)
+    date_hierarchy = "date"
+    list_select_related = ("staff",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
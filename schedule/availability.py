@@ -0,0 +1,350 @@
+"""Пакетный расчёт свободного времени мастеров.
+
+Расписание мастеров за весь интервал дат загружается фиксированным числом
+запросов (календарь StaffDay, записи), после чего все проверки
+выполняются в памяти. Загруженные дни кешируются (см. schedule.cache).
+
+Свободное время дня хранится битовой картой из ячеек по CELL_MINUTES минут,
+поэтому проверка "помещается ли услуга длительностью D" выполняется сразу
+для всех времён начала несколькими сдвигами и побитовыми "и".
+"""
+from dataclasses import dataclass, field
+from datetime import time, timedelta
+from functools import cached_property
+
+from django.conf import settings
+from django.utils import timezone
+
+from bookings.models import Booking
+from users.models import User
+from . import cache as schedule_cache, staff_days
+
+
+# Шаг сетки слотов и минимальный запас времени для записи на сегодня
+SLOT_STEP_MINUTES = getattr(settings, "BOOKING_SLOT_STEP_MINUTES", 30)
+MIN_LEAD_MINUTES = 5
+
+# Размер ячейки битовой карты занятости
+CELL_MINUTES = 5
+
+# Поиск ближайшего времени у любого мастера: горизонт и размер пачки дней
+SEARCH_HORIZON_DAYS = 30
+SEARCH_CHUNK_DAYS = 7
+
+
+def to_minutes(value):
+    """Время суток -> минуты от полуночи"""
+    return value.hour * 60 + value.minute
+
+
+def end_minutes(value):
+    """Время окончания -> минуты от полуночи (23:59:59.999999 - конец суток)"""
+    if value == time.max:
+        return 24 * 60
+    return to_minutes(value)
+
+
+def from_minutes(minutes):
+    """Минуты от полуночи -> время суток"""
+    return time(minutes // 60, minutes % 60)
+
+
+def daterange(date_from, date_to):
+    """Все даты от date_from до date_to включительно"""
+    day = date_from
+    while day <= date_to:
+        yield day
+        day += timedelta(days=1)
+
+
+@dataclass
+class DaySchedule:
+    """Расписание одного мастера на один день (в минутах от полуночи)"""
+
+    staff_id: int
+    date: object
+    start: int | None = None  # None - выходной
+    end: int | None = None
+    busy: list = field(default_factory=list)  # [(начало, конец), ...]
+
+    @property
+    def is_working(self):
+        return self.start is not None and self.end is not None
+
+    @cached_property
+    def free_mask(self):
+        """Битовая карта свободного времени: бит i - ячейка [i*CELL_MINUTES, (i+1)*CELL_MINUTES).
+
+        Рабочий интервал округляется внутрь, занятые интервалы - наружу;
+        пустые занятые интервалы пропускаются.
+        """
+        if not self.is_working:
+            return 0
+        first = -(-self.start // CELL_MINUTES)
+        last = self.end // CELL_MINUTES
+        if last <= first:
+            return 0
+        mask = ((1 << (last - first)) - 1) << first
+        for b_start, b_end in self.busy:
+            if b_end <= b_start:
+                continue
+            low = b_start // CELL_MINUTES
+            high = -(-b_end // CELL_MINUTES)
+            if high > low:
+                mask &= ~(((1 << (high - low)) - 1) << low)
+        return mask
+
+    def starts_mask(self, duration_minutes):
+        """Битовая карта допустимых начал: бит i установлен, если услуга
+        длительностью duration_minutes помещается, начавшись в ячейке i"""
+        cells = max(1, -(-duration_minutes // CELL_MINUTES))
+        mask = self.free_mask
+        # Свободный отрезок из cells ячеек ищем удвоением длины за O(log cells) сдвигов
+        span = 1
+        while span * 2 <= cells:
+            mask &= mask >> span
+            span *= 2
+        if span < cells:
+            mask &= mask >> (cells - span)
+        return mask
+
+    def fits(self, start, duration_minutes):
+        """Помещается ли услуга, начинающаяся в start (минуты), в расписание"""
+        if not self.is_working:
+            return False
+        if start % CELL_MINUTES or duration_minutes % CELL_MINUTES:
+            return self.fits_intervals(start, duration_minutes)
+        return bool(self.starts_mask(duration_minutes) >> (start // CELL_MINUTES) & 1)
+
+    def fits_intervals(self, start, duration_minutes):
+        """Точная проверка по интервалам (для времени вне сетки ячеек).
+
+        Пустой занятый интервал времени не занимает - как и в битовой карте.
+        """
+        if not self.is_working:
+            return False
+        end = start + duration_minutes
+        if start < self.start or end > self.end:
+            return False
+        return not any(
+            b_start < end and start < b_end and b_start < b_end for b_start, b_end in self.busy
+        )
+
+    def free_slots(self, duration_minutes, step=SLOT_STEP_MINUTES, not_before=0):
+        """Все свободные времена начала услуги заданной длительности"""
+        if not self.is_working:
+            return []
+        first = max(self.start, not_before)
+        # Выравниваем начало по сетке от начала рабочего дня
+        if first > self.start:
+            first = self.start + -(-(first - self.start) // step) * step
+        minutes = range(first, self.end - duration_minutes + 1, step)
+        if first % CELL_MINUTES or step % CELL_MINUTES or duration_minutes % CELL_MINUTES:
+            return [from_minutes(m) for m in minutes if self.fits_intervals(m, duration_minutes)]
+        starts = self.starts_mask(duration_minutes)
+        return [from_minutes(m) for m in minutes if starts >> (m // CELL_MINUTES) & 1]
+
+
+def load_day_schedules(staff_ids, date_from, date_to):
+    """Расписание мастеров staff_ids на каждый день интервала.
+
+    Дни, которых нет в кеше, загружаются из БД фиксированным числом запросов
+    независимо от числа мастеров и дней. Возвращает словарь {(staff_id, date): DaySchedule}.
+    """
+    staff_ids = list(staff_ids)
+    if not staff_ids or date_from > date_to:
+        return {}
+
+    pairs = [(staff_id, day) for staff_id in staff_ids for day in daterange(date_from, date_to)]
+    # Версии читаются до БД: сброс дня во время загрузки не даст записать старое
+    versions = schedule_cache.day_versions(pairs)
+    schedules = schedule_cache.get_many(versions)
+    missing = [pair for pair in pairs if pair not in schedules]
+    if missing:
+        loaded = load_from_db(
+            {staff_id for staff_id, _ in missing},
+            min(day for _, day in missing),
+            max(day for _, day in missing),
+        )
+        schedule_cache.set_many(loaded, versions)
+        schedules.update(loaded)
+    return {pair: schedules[pair] for pair in pairs}
+
+
+def load_from_db(staff_ids, date_from, date_to):
+    """Загрузка расписания мастеров из БД: календарь StaffDay и записи"""
+    schedules = {}
+    for (staff_id, day), (start, end) in staff_days.load_hours(staff_ids, date_from, date_to).items():
+        schedule = DaySchedule(staff_id=staff_id, date=day)
+        if start is not None and end is not None:
+            schedule.start = to_minutes(start)
+            schedule.end = to_minutes(end)
+        schedules[(staff_id, day)] = schedule
+
+    # Время окончания хранится в записи, поэтому обходимся без JOIN с услугами
+    bookings = (
+        Booking.objects.active()
+        .filter(
+            staff_id__in=staff_ids,
+            appointment_date__range=(date_from, date_to),
+        )
+        .values("staff_id", "appointment_date", "appointment_time", "end_time")
+    )
+    for row in bookings:
+        schedules[(row["staff_id"], row["appointment_date"])].busy.append(
+            (to_minutes(row["appointment_time"]), end_minutes(row["end_time"]))
+        )
+
+    return schedules
+
+
+def not_before(day, now):
+    """Минимальное время начала записи на дату day с учётом текущего времени"""
+    if day > now.date():
+        return 0
+    if day < now.date():
+        return 24 * 60
+    return to_minutes(now.time()) + MIN_LEAD_MINUTES + 1
+
+
+def free_slots(staff, date_from, date_to, duration_minutes, step=SLOT_STEP_MINUTES):
+    """Свободные слоты мастера на интервал дат: {date: [time, ...]}
+
+    Прошедшие слоты (и слоты ближе MIN_LEAD_MINUTES к текущему моменту)
+    не возвращаются.
+    """
+    staff_id = getattr(staff, "pk", staff)
+    schedules = load_day_schedules([staff_id], date_from, date_to)
+    now = timezone.localtime(timezone.now())
+    return {
+        day: schedules[(staff_id, day)].free_slots(
+            duration_minutes, step, not_before(day, now)
+        )
+        for day in daterange(date_from, date_to)
+    }
+
+
+def slot_choices(staff, day, duration_minutes):
+    """Варианты времени для формы записи: [("HH:MM", "HH:MM"), ...]
+
+    Строятся по расписанию мастера (из кеша) и длительности услуги, поэтому
+    клиенту предлагаются только слоты, которые пройдут проверку.
+    """
+    slots = free_slots(staff, day, day, duration_minutes)[day]
+    return [(slot.strftime("%H:%M"), slot.strftime("%H:%M")) for slot in slots]
+
+
+def is_staff_available(staff, date, start_time, duration_minutes):
+    """Проверка, что услуга длительностью duration_minutes помещается в
+    расписание мастера и не пересекается с другими записями"""
+    staff_id = getattr(staff, "pk", staff)
+    schedule = load_day_schedules([staff_id], date, date)[(staff_id, date)]
+    return schedule.fits(to_minutes(start_time), duration_minutes)
+
+
+def eligible_staff_ids(service):
+    """Мастера, специализирующиеся на категории услуги"""
+    return list(
+        User.objects.filter(role="staff", specialization_id=service.category_id)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def earliest_slots(service, limit=5, horizon_days=SEARCH_HORIZON_DAYS, staff_ids=None):
+    """Ближайшие свободные слоты для услуги у любого подходящего мастера.
+
+    Расписание всех мастеров загружается пачками по SEARCH_CHUNK_DAYS дней,
+    поиск останавливается, как только найдено limit слотов. Возвращает
+    список (date, time, staff_id), упорядоченный по времени.
+    """
+    if staff_ids is None:
+        staff_ids = eligible_staff_ids(service)
+    if not staff_ids or limit <= 0:
+        return []
+
+    now = timezone.localtime(timezone.now())
+    today = now.date()
+    horizon_end = today + timedelta(days=horizon_days - 1)
+    found = []
+    chunk_start = today
+    while chunk_start <= horizon_end and len(found) < limit:
+        chunk_end = min(chunk_start + timedelta(days=SEARCH_CHUNK_DAYS - 1), horizon_end)
+        schedules = load_day_schedules(staff_ids, chunk_start, chunk_end)
+        for day in daterange(chunk_start, chunk_end):
+            day_slots = sorted(
+                (slot, staff_id)
+                for staff_id in staff_ids
+                for slot in schedules[(staff_id, day)].free_slots(
+                    service.duration_minutes, not_before=not_before(day, now)
+                )
+            )
+            found.extend((day, slot, staff_id) for slot, staff_id in day_slots)
+            if len(found) >= limit:
+                break
+        chunk_start = chunk_end + timedelta(days=1)
+    return found[:limit]
+
+
+def combo_plan(services, day, start_time=None, staff_ids=None):
+    """Подбор времени для нескольких услуг подряд в один день.
+
+    Услуги выполняются в переданном порядке, каждая начинается сразу после
+    окончания предыдущей; мастер подбирается для каждой услуги отдельно
+    (предпочтительно тот же, что и для предыдущей). Расписание всех
+    подходящих мастеров загружается один раз. Если start_time задано,
+    проверяется только это время начала, иначе ищется самое раннее.
+
+    Возвращает список (service, staff_id, time) или None, если цепочка
+    не помещается ни у одного мастера.
+    """
+    services = list(services)
+    if not services:
+        return None
+
+    staff = User.objects.filter(
+        role="staff", specialization_id__in={service.category_id for service in services}
+    )
+    if staff_ids is not None:
+        staff = staff.filter(pk__in=staff_ids)
+    by_category = {}
+    for staff_id, category_id in staff.order_by("id").values_list("id", "specialization_id"):
+        by_category.setdefault(category_id, []).append(staff_id)
+    candidates = [by_category.get(service.category_id, []) for service in services]
+    if not all(candidates):
+        return None
+
+    schedules = load_day_schedules({staff_id for ids in candidates for staff_id in ids}, day, day)
+    earliest = not_before(day, timezone.localtime(timezone.now()))
+    if start_time is not None:
+        starts = [to_minutes(start_time)] if to_minutes(start_time) >= earliest else []
+    else:
+        starts = sorted({
+            to_minutes(slot)
+            for staff_id in candidates[0]
+            for slot in schedules[(staff_id, day)].free_slots(
+                services[0].duration_minutes, not_before=earliest
+            )
+        })
+
+    for start in starts:
+        plan = []
+        minute = start
+        previous = None
+        for service, staff_for_service in zip(services, candidates):
+            ordered = sorted(staff_for_service, key=lambda staff_id: staff_id != previous)
+            previous = next(
+                (
+                    staff_id
+                    for staff_id in ordered
+                    if schedules[(staff_id, day)].fits(minute, service.duration_minutes)
+                ),
+                None,
+            )
+            if previous is None:
+                break
+            plan.append((service, previous, from_minutes(minute)))
+            minute += service.duration_minutes
+        else:
+            return plan
+    return None
@@ -0,0 +1,144 @@
+"""Кеш расписания мастеров по дням.
+
+Ключ - (staff_id, date), значение - DaySchedule (рабочий интервал и занятые
+интервалы). Изменение рабочих часов мастера затрагивает все его дни, поэтому
+в ключ входит версия расписания мастера, которая увеличивается при изменении
+WorkingHours. Записи и особые часы меняют версию конкретного дня.
+
+Версии читаются до загрузки расписания из БД и передаются в set_many: если
+день сбросили, пока запрос читал БД, устаревшее расписание в кеш не пишется.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+CACHE_TIMEOUT = getattr(settings, "SCHEDULE_CACHE_TIMEOUT", 60 * 60)
+
+HITS_KEY = "schedule:stats:hits"
+MISSES_KEY = "schedule:stats:misses"
+
+
+def _version_key(staff_id):
+    return f"schedule:version:{staff_id}"
+
+
+def _day_version_key(staff_id, day):
+    return f"schedule:version:{staff_id}:{day.isoformat()}"
+
+
+def _day_key(staff_id, day, version):
+    staff_version, day_version = version
+    return f"schedule:day:{staff_id}:{staff_version}:{day_version}:{day.isoformat()}"
+
+
+def _versions(staff_ids):
+    """Текущие версии расписания мастеров {staff_id: version}"""
+    keys = {_version_key(staff_id): staff_id for staff_id in staff_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    for key, staff_id in keys.items():
+        if staff_id not in versions:
+            # Версия по времени, чтобы после вытеснения ключа не прочитать старые дни
+            cache.add(key, time.time_ns(), None)
+            versions[staff_id] = cache.get(key)
+    return versions
+
+
+def _count(key, delta):
+    if not delta:
+        return
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+
+
+def day_versions(pairs):
+    """Версии кеша для пар (staff_id, date): {(staff_id, date): (версия мастера, версия дня)}"""
+    pairs = set(pairs)
+    staff_versions = _versions({staff_id for staff_id, _ in pairs})
+    keys = {_day_version_key(staff_id, day): (staff_id, day) for staff_id, day in pairs}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        # Версия по времени, чтобы после вытеснения ключа не прочитать старый день
+        cache.set_many(missing, CACHE_TIMEOUT)
+        found.update(missing)
+    return {
+        (staff_id, day): (staff_versions[staff_id], found[key])
+        for key, (staff_id, day) in keys.items()
+    }
+
+
+def get_many(versions):
+    """Расписания из кеша для версий из day_versions(): {(staff_id, date): DaySchedule}"""
+    keys = {
+        _day_key(staff_id, day, version): (staff_id, day)
+        for (staff_id, day), version in versions.items()
+    }
+    found = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    _count(HITS_KEY, len(found))
+    _count(MISSES_KEY, len(versions) - len(found))
+    return found
+
+
+def set_many(schedules, versions):
+    """Сохранить расписания {(staff_id, date): DaySchedule}, загруженные из БД
+    при версиях versions. Дни, которые с тех пор сбросили, не сохраняются."""
+    current = day_versions(schedules)
+    cache.set_many(
+        {
+            _day_key(staff_id, day, current[(staff_id, day)]): schedule
+            for (staff_id, day), schedule in schedules.items()
+            if current[(staff_id, day)] == versions.get((staff_id, day))
+        },
+        CACHE_TIMEOUT,
+    )
+
+
+def _invalidate_days(pairs):
+    if pairs:
+        now = time.time_ns()
+        cache.set_many({_day_version_key(staff_id, day): now for staff_id, day in pairs}, CACHE_TIMEOUT)
+
+
+def _invalidate_staff(staff_id):
+    key = _version_key(staff_id)
+    cache.add(key, time.time_ns(), None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def invalidate_days(pairs):
+    """Сбросить кеш дней (staff_id, date) сейчас и после фиксации транзакции"""
+    pairs = set(pairs)
+    _invalidate_days(pairs)
+    transaction.on_commit(lambda: _invalidate_days(pairs))
+
+
+def invalidate_staff(staff_id):
+    """Сбросить кеш всех дней мастера"""
+    _invalidate_staff(staff_id)
+    transaction.on_commit(lambda: _invalidate_staff(staff_id))
+
+
+def stats():
+    """Счётчики попаданий и промахов кеша"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from bookings.models import Booking
+from schedule import availability
+from schedule.models import WorkingHours, SpecialHours
+
+
+def legacy_is_staff_available(staff_id, date, time, duration_minutes):
+    """Прежняя проверка из форм: отдельные запросы на каждый слот"""
+    special_hours = SpecialHours.objects.filter(staff_id=staff_id, date=date).first()
+    if special_hours:
+        if special_hours.start_time is None:
+            return False
+        if not (special_hours.start_time <= time <= special_hours.end_time):
+            return False
+    else:
+        working_hours = WorkingHours.objects.filter(
+            staff_id=staff_id, day_of_week=date.weekday(), is_active=True
+        ).first()
+        if not working_hours:
+            return False
+        if not (working_hours.start_time <= time <= working_hours.end_time):
+            return False
+
+    end_time = (datetime.combine(date, time) + timedelta(minutes=duration_minutes)).time()
+    return not (
+        Booking.objects.filter(
+            staff_id=staff_id,
+            appointment_date=date,
+            appointment_time__lt=end_time,
+            appointment_time__gte=time,
+        )
+        .exclude(status="cancelled")
+        .exists()
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить проверку доступности мастера: запрос на каждый слот, "
+        "интервалы в памяти и битовые карты"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--staff", type=int, help="ID мастера (по умолчанию первый с расписанием)")
+        parser.add_argument("--days", type=int, default=7, help="Количество дней")
+        parser.add_argument("--duration", type=int, default=60, help="Длительность услуги, мин")
+        parser.add_argument("--repeat", type=int, default=20, help="Повторов для расчётов в памяти")
+
+    def measure(self, label, func, repeat=1):
+        with CaptureQueriesContext(connection) as queries:
+            started = perf_counter()
+            for _ in range(repeat):
+                result = func()
+            elapsed = (perf_counter() - started) / repeat
+        self.stdout.write(
+            f"{label:<32} {elapsed * 1000:10.3f} мс  запросов: {len(queries) // repeat}"
+        )
+        return result
+
+    def handle(self, *args, **options):
+        staff_id = options["staff"] or (
+            WorkingHours.objects.values_list("staff_id", flat=True).order_by("staff_id").first()
+        )
+        if not staff_id:
+            raise CommandError("Нет мастеров с рабочими часами")
+
+        duration = options["duration"]
+        date_from = timezone.localdate() + timedelta(days=1)
+        date_to = date_from + timedelta(days=options["days"] - 1)
+        step = availability.SLOT_STEP_MINUTES
+        candidates = [
+            (day, availability.from_minutes(minute))
+            for day in availability.daterange(date_from, date_to)
+            for minute in range(0, 24 * 60 - duration + 1, step)
+        ]
+        self.stdout.write(
+            f"Мастер {staff_id}, {date_from} - {date_to}, услуга {duration} мин, "
+            f"слотов-кандидатов: {len(candidates)}"
+        )
+
+        self.measure(
+            "Запрос на каждый слот",
+            lambda: [legacy_is_staff_available(staff_id, day, t, duration) for day, t in candidates],
+        )
+        schedules = self.measure(
+            "Загрузка расписания из БД",
+            lambda: availability.load_from_db([staff_id], date_from, date_to),
+        )
+        days = [schedules[(staff_id, day)] for day in availability.daterange(date_from, date_to)]
+        intervals = self.measure(
+            "Интервалы в памяти",
+            lambda: [
+                [m for m in range(0, 24 * 60 - duration + 1, step) if day.fits_intervals(m, duration)]
+                for day in days
+            ],
+            options["repeat"],
+        )
+
+        def bitmap_slots():
+            result = []
+            for day in days:
+                day.__dict__.pop("free_mask", None)  # Считаем карту заново
+                starts = day.starts_mask(duration)
+                result.append(
+                    [m for m in range(0, 24 * 60 - duration + 1, step) if starts >> (m // availability.CELL_MINUTES) & 1]
+                )
+            return result
+
+        bitmaps = self.measure("Битовые карты", bitmap_slots, options["repeat"])
+        if intervals != bitmaps:
+            raise CommandError("Результаты интервалов и битовых карт не совпадают")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from schedule import staff_days
+
+
+class Command(BaseCommand):
+    help = (
+        "Построить календарь мастеров (StaffDay) на STAFF_DAY_HORIZON_DAYS дней вперёд. "
+        "Запускать ежедневно, чтобы горизонт сдвигался"
+    )
+
+    def handle(self, *args, **options):
+        purged = staff_days.purge_past()
+        written = staff_days.refresh()
+        self.stdout.write(
+            self.style.SUCCESS(f"Записано дней: {written}, удалено прошедших: {purged}")
+        )
@@ -0,0 +1,169 @@
+import csv
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bookings.models import Booking
+from schedule import staff_days
+from schedule.models import SalonClosure
+
+
+def parse_csv(path):
+    """CSV с заголовком date,start_time,end_time,note.
+
+    Пустые start_time/end_time - салон закрыт весь день.
+    """
+    closures = {}
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for line, row in enumerate(csv.DictReader(file), start=2):
+            try:
+                day = datetime.strptime(row["date"].strip(), "%Y-%m-%d").date()
+                start = (row.get("start_time") or "").strip()
+                end = (row.get("end_time") or "").strip()
+                closures[day] = SalonClosure(
+                    date=day,
+                    start_time=datetime.strptime(start, "%H:%M").time() if start else None,
+                    end_time=datetime.strptime(end, "%H:%M").time() if end else None,
+                    note=(row.get("note") or "").strip(),
+                )
+            except (KeyError, ValueError) as error:
+                raise CommandError(f"Строка {line}: {error}")
+    return list(closures.values())
+
+
+def _ical_lines(path):
+    """Строки iCal с учётом переноса (продолжение начинается с пробела)"""
+    lines = []
+    for raw in Path(path).read_text(encoding="utf-8").splitlines():
+        if raw[:1] in (" ", "\t") and lines:
+            lines[-1] += raw[1:]
+        else:
+            lines.append(raw)
+    return lines
+
+
+def _ical_value(value):
+    """DATE (20260101) или DATE-TIME (20260101T100000) из iCal"""
+    value = value.rstrip("Z")
+    if "T" in value:
+        return datetime.strptime(value, "%Y%m%dT%H%M%S")
+    return datetime.strptime(value, "%Y%m%d").date()
+
+
+def parse_ical(path):
+    """События VEVENT из iCal-календаря праздников.
+
+    Событие на весь день (или несколько дней) - салон закрыт; событие со
+    временем - сокращённый день, салон работает с DTSTART до DTEND.
+    """
+    closures = {}
+    event = None
+    for line in _ical_lines(path):
+        if line == "BEGIN:VEVENT":
+            event = {}
+        elif line == "END:VEVENT" and event is not None:
+            if "DTSTART" not in event:
+                raise CommandError("Событие без DTSTART")
+            start = event["DTSTART"]
+            end = event.get("DTEND")
+            note = event.get("SUMMARY", "")
+            if isinstance(start, datetime):
+                day = start.date()
+                closures[day] = SalonClosure(
+                    date=day,
+                    start_time=start.time(),
+                    end_time=end.time() if end else None,
+                    note=note,
+                )
+            else:
+                # DTEND для событий на весь день не включается
+                last = (end - timedelta(days=1)) if end else start
+                day = start
+                while day <= last:
+                    closures[day] = SalonClosure(date=day, note=note)
+                    day += timedelta(days=1)
+            event = None
+        elif event is not None and ":" in line:
+            name, value = line.split(":", 1)
+            name = name.split(";", 1)[0].upper()
+            try:
+                if name in ("DTSTART", "DTEND"):
+                    event[name] = _ical_value(value.strip())
+                elif name == "SUMMARY":
+                    event[name] = value.strip().replace("\\,", ",")
+            except ValueError as error:
+                raise CommandError(f"{name}: {error}")
+    return list(closures.values())
+
+
+class Command(BaseCommand):
+    help = (
+        "Импорт выходных и сокращённых дней салона из CSV (date,start_time,end_time,note) "
+        "или iCal (.ics) с отчётом о записях, которые попадают на закрытое время"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу .csv или .ics")
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Показать конфликты без сохранения",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path.lower().endswith((".ics", ".ical")):
+            closures = parse_ical(path)
+        else:
+            closures = parse_csv(path)
+        if not closures:
+            self.stdout.write("Файл не содержит дат")
+            return
+
+        dates = [closure.date for closure in closures]
+        with transaction.atomic():
+            SalonClosure.objects.bulk_create(
+                closures,
+                update_conflicts=True,
+                unique_fields=["date"],
+                update_fields=["start_time", "end_time", "note", "updated_at"],
+            )
+            staff_days.refresh_salon_dates(dates)
+            conflicts = self.find_conflicts(dates)
+            if options["dry_run"]:
+                transaction.set_rollback(True)
+
+        for booking in conflicts:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Конфликт: запись #{booking.pk} {booking.appointment_date} "
+                    f"{booking.appointment_time:%H:%M}-{booking.end_time:%H:%M}, "
+                    f"мастер {booking.staff.get_full_name() or booking.staff.username}, "
+                    f"клиент {booking.client.get_full_name() or booking.client.username}"
+                )
+            )
+        action = "Проверено" if options["dry_run"] else "Импортировано"
+        self.stdout.write(
+            self.style.SUCCESS(f"{action} дат: {len(dates)}, конфликтующих записей: {len(conflicts)}")
+        )
+
+    def find_conflicts(self, dates):
+        """Активные записи, которые не помещаются в новый рабочий интервал мастера"""
+        bookings = list(
+            Booking.objects.active()
+            .filter(appointment_date__in=dates)
+            .select_related("client", "staff")
+            .order_by("appointment_date", "appointment_time")
+        )
+        if not bookings:
+            return []
+        hours = staff_days.load_hours(
+            {booking.staff_id for booking in bookings}, min(dates), max(dates)
+        )
+        conflicts = []
+        for booking in bookings:
+            start, end = hours[(booking.staff_id, booking.appointment_date)]
+            if start is None or booking.appointment_time < start or booking.end_time > end:
+                conflicts.append(booking)
+        return conflicts
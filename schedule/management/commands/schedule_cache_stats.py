@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from schedule import cache as schedule_cache
+
+
+class Command(BaseCommand):
+    help = "Показать счётчики попаданий/промахов кеша расписания"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Обнулить счётчики")
+
+    def handle(self, *args, **options):
+        stats = schedule_cache.stats()
+        self.stdout.write(
+            f"Попадания: {stats['hits']}, промахи: {stats['misses']}, "
+            f"доля попаданий: {stats['hit_rate']:.1%}"
+        )
+        if options["reset"]:
+            schedule_cache.reset_stats()
+            self.stdout.write("Счётчики обнулены")
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:38
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='specialhours',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='workinghours',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AlterField(
+            model_name='specialhours',
+            name='date',
+            field=models.DateField(verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='specialhours',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='Время окончания'),
+        ),
+        migrations.AlterField(
+            model_name='specialhours',
+            name='note',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Примечание'),
+        ),
+        migrations.AlterField(
+            model_name='specialhours',
+            name='staff',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='special_hours', to=settings.AUTH_USER_MODEL, verbose_name='Мастер'),
+        ),
+        migrations.AlterField(
+            model_name='specialhours',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='Время начала'),
+        ),
+        migrations.AlterField(
+            model_name='workinghours',
+            name='day_of_week',
+            field=models.PositiveIntegerField(help_text='0=Понедельник, 1=Вторник, ..., 6=Воскресенье', validators=[django.core.validators.MinValueValidator(0), django.core.validators.MaxValueValidator(6)], verbose_name='День недели'),
+        ),
+        migrations.AlterField(
+            model_name='workinghours',
+            name='end_time',
+            field=models.TimeField(verbose_name='Время окончания'),
+        ),
+        migrations.AlterField(
+            model_name='workinghours',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активно'),
+        ),
+        migrations.AlterField(
+            model_name='workinghours',
+            name='staff',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to=settings.AUTH_USER_MODEL, verbose_name='Мастер'),
+        ),
+        migrations.AlterField(
+            model_name='workinghours',
+            name='start_time',
+            field=models.TimeField(verbose_name='Время начала'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0002_specialhours_updated_at_workinghours_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaffDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='Время начала')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='Время окончания')),
+                ('is_day_off', models.BooleanField(default=False, verbose_name='Выходной')),
+                ('staff', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='staff_days', to=settings.AUTH_USER_MODEL, verbose_name='Мастер')),
+            ],
+            options={
+                'verbose_name': 'День мастера',
+                'verbose_name_plural': 'Календарь мастеров',
+                'ordering': ['date', 'staff'],
+                'unique_together': {('staff', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0003_staffday'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalonClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Дата')),
+                ('start_time', models.TimeField(blank=True, null=True, verbose_name='Время начала')),
+                ('end_time', models.TimeField(blank=True, null=True, verbose_name='Время окончания')),
+                ('note', models.CharField(blank=True, max_length=255, verbose_name='Примечание')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Выходной салона',
+                'verbose_name_plural': 'Выходные и праздники салона',
+                'ordering': ['date'],
+            },
+        ),
+    ]
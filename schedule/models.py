@@ -14,6 +14,7 @@ class WorkingHours(models.Model):
     start_time = models.TimeField(verbose_name="Время начала")
     end_time = models.TimeField(verbose_name="Время окончания")
     is_active = models.BooleanField(default=True, verbose_name="Активно")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         verbose_name = "Рабочие часы"
@@ -33,6 +34,7 @@ class SpecialHours(models.Model):
     start_time = models.TimeField(null=True, blank=True, verbose_name="Время начала") # None - выходной
     end_time = models.TimeField(null=True, blank=True, verbose_name="Время окончания")
     note = models.CharField(max_length=255, blank=True, verbose_name="Примечание")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     class Meta:
         verbose_name = "Особые часы работы"
@@ -45,3 +47,52 @@ class SpecialHours(models.Model):
             return f"{self.staff.username} - {self.date} {self.start_time}-{self.end_time}"
         else:
             return f"{self.staff.username} - {self.date} (выходной)"
+
+
+class SalonClosure(models.Model):
+    """Выходной или сокращённый день всего салона (праздники).
+
+    Действует на всех мастеров; особые часы конкретного мастера имеют
+    приоритет над ним.
+    """
+    date = models.DateField(unique=True, verbose_name="Дата")
+    start_time = models.TimeField(null=True, blank=True, verbose_name="Время начала") # None - салон закрыт
+    end_time = models.TimeField(null=True, blank=True, verbose_name="Время окончания")
+    note = models.CharField(max_length=255, blank=True, verbose_name="Примечание")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Выходной салона"
+        verbose_name_plural = "Выходные и праздники салона"
+        ordering = ["date"]
+
+    def __str__(self) -> str:
+        if self.start_time and self.end_time:
+            return f"{self.date} {self.start_time}-{self.end_time} {self.note}".strip()
+        else:
+            return f"{self.date} (салон закрыт) {self.note}".strip()
+
+
+class StaffDay(models.Model):
+    """Рабочий день мастера на конкретную дату.
+
+    Материализованное расписание: правило по дню недели уже объединено
+    с выходными салона и особыми часами мастера. Заполняется командой build_staff_days и обновляется
+    при изменении WorkingHours и SpecialHours.
+    """
+    staff = models.ForeignKey(User, on_delete=models.CASCADE, related_name="staff_days", verbose_name="Мастер")
+    date = models.DateField(verbose_name="Дата")
+    start_time = models.TimeField(null=True, blank=True, verbose_name="Время начала")
+    end_time = models.TimeField(null=True, blank=True, verbose_name="Время окончания")
+    is_day_off = models.BooleanField(default=False, verbose_name="Выходной")
+
+    class Meta:
+        verbose_name = "День мастера"
+        verbose_name_plural = "Календарь мастеров"
+        unique_together = ("staff", "date")
+        ordering = ["date", "staff"]
+
+    def __str__(self) -> str:
+        if self.is_day_off:
+            return f"{self.staff.username} - {self.date} (выходной)"
+        return f"{self.staff.username} - {self.date} {self.start_time}-{self.end_time}"
@@ -0,0 +1,77 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from bookings.models import Booking
+from bookings.signals import bookings_created, bookings_transitioned
+from . import cache as schedule_cache, staff_days
+from users.models import User
+from .models import WorkingHours, SpecialHours, SalonClosure
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_booking_day(sender, instance, **kwargs):
+    """Запись изменилась - сбрасываем кеш её дня (и прежнего дня при переносе)"""
+    days = {(instance.staff_id, instance.appointment_date)}
+    original = getattr(instance, "_original", None)
+    if original:
+        days.add((original["staff_id"], original["appointment_date"]))
+    schedule_cache.invalidate_days(days)
+
+
+@receiver(bookings_transitioned)
+def invalidate_transitioned_days(sender, bookings, **kwargs):
+    """Массовая смена статуса (например, отмена) освобождает или занимает время"""
+    schedule_cache.invalidate_days({(staff_id, day) for _, staff_id, day in bookings})
+
+
+@receiver(bookings_created)
+def invalidate_created_days(sender, bookings, **kwargs):
+    """Записи, созданные пачкой (комплекс услуг), занимают время мастеров"""
+    schedule_cache.invalidate_days({(booking.staff_id, booking.appointment_date) for booking in bookings})
+
+
+def _deleted_with_staff(kwargs):
+    """Часы удаляются каскадом вместе с мастером: его StaffDay удаляются
+    тем же каскадом, пересчитывать календарь нельзя"""
+    origin = kwargs.get("origin")
+    return getattr(origin, "model", type(origin)) is User
+
+
+@receiver([post_save, post_delete], sender=SpecialHours)
+def refresh_special_day(sender, instance, created=False, **kwargs):
+    """Особые часы: новый или удалённый день пересчитываем точечно,
+    при изменении (дата могла смениться) - весь календарь мастера"""
+    if _deleted_with_staff(kwargs):
+        schedule_cache.invalidate_staff(instance.staff_id)
+    elif created or kwargs["signal"] is post_delete:
+        staff_days.refresh([instance.staff_id], instance.date, instance.date)
+        schedule_cache.invalidate_days({(instance.staff_id, instance.date)})
+    else:
+        staff_days.refresh([instance.staff_id])
+        schedule_cache.invalidate_staff(instance.staff_id)
+
+
+@receiver([post_save, post_delete], sender=WorkingHours)
+def refresh_working_hours(sender, instance, **kwargs):
+    """Рабочие часы влияют на все дни недели мастера"""
+    if not _deleted_with_staff(kwargs):
+        staff_days.refresh([instance.staff_id])
+    schedule_cache.invalidate_staff(instance.staff_id)
+
+
+@receiver(pre_save, sender=SalonClosure)
+def remember_closure_date(sender, instance, **kwargs):
+    """При переносе выходного салона нужно пересчитать и прежнюю дату"""
+    instance._previous_date = (
+        SalonClosure.objects.filter(pk=instance.pk).values_list("date", flat=True).first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver([post_save, post_delete], sender=SalonClosure)
+def refresh_salon_closure(sender, instance, **kwargs):
+    """Выходной салона затрагивает всех мастеров в этот день"""
+    dates = {instance.date}
+    if getattr(instance, "_previous_date", None):
+        dates.add(instance._previous_date)
+    staff_days.refresh_salon_dates(dates)
@@ -0,0 +1,171 @@
+"""Календарь мастеров по датам (таблица StaffDay).
+
+Рабочий интервал дня складывается из слоёв (от высшего приоритета):
+особые часы мастера, выходной/сокращённый день салона, расписание мастера
+по дню недели. Результат вычисляется здесь один раз и сохраняется
+в StaffDay на HORIZON_DAYS дней вперёд.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from users.models import User
+from . import cache as schedule_cache
+from .models import WorkingHours, SpecialHours, SalonClosure, StaffDay
+
+
+HORIZON_DAYS = getattr(settings, "STAFF_DAY_HORIZON_DAYS", 90)
+
+
+def _daterange(date_from, date_to):
+    day = date_from
+    while day <= date_to:
+        yield day
+        day += timedelta(days=1)
+
+
+def resolve_hours(staff_ids, date_from, date_to):
+    """Рабочий интервал мастеров по дням из правил (три запроса).
+
+    Возвращает {(staff_id, date): (start_time, end_time)}; для выходных
+    значение (None, None).
+    """
+    weekly = {
+        (row["staff_id"], row["day_of_week"]): row
+        for row in WorkingHours.objects.filter(
+            staff_id__in=staff_ids, is_active=True
+        ).values("staff_id", "day_of_week", "start_time", "end_time")
+    }
+    special = {
+        (row["staff_id"], row["date"]): row
+        for row in SpecialHours.objects.filter(
+            staff_id__in=staff_ids, date__range=(date_from, date_to)
+        ).values("staff_id", "date", "start_time", "end_time")
+    }
+    closures = {
+        row["date"]: row
+        for row in SalonClosure.objects.filter(
+            date__range=(date_from, date_to)
+        ).values("date", "start_time", "end_time")
+    }
+
+    hours = {}
+    for staff_id in staff_ids:
+        for day in _daterange(date_from, date_to):
+            hours[(staff_id, day)] = _resolve_day(
+                special.get((staff_id, day)),
+                closures.get(day),
+                weekly.get((staff_id, day.weekday())),
+            )
+    return hours
+
+
+def _resolve_day(special, closure, weekly):
+    """Рабочий интервал одного дня по слоям расписания"""
+    # Особые часы мастера имеют приоритет над всем остальным
+    if special:
+        if special["start_time"] is None or special["end_time"] is None:
+            return (None, None)
+        return (special["start_time"], special["end_time"])
+
+    if not weekly:
+        return (None, None)
+    start, end = weekly["start_time"], weekly["end_time"]
+
+    # Салон закрыт или работает по сокращённому графику
+    if closure:
+        if closure["start_time"] is None or closure["end_time"] is None:
+            return (None, None)
+        start = max(start, closure["start_time"])
+        end = min(end, closure["end_time"])
+        if start >= end:
+            return (None, None)
+    return (start, end)
+
+
+def horizon():
+    """Интервал дат, который хранится в StaffDay"""
+    today = timezone.localdate()
+    return today, today + timedelta(days=HORIZON_DAYS - 1)
+
+
+def refresh(staff_ids=None, date_from=None, date_to=None):
+    """Пересчитать StaffDay для мастеров и дат (по умолчанию - все мастера
+    на весь горизонт). Возвращает количество записанных строк."""
+    first, last = horizon()
+    date_from = max(date_from or first, first)
+    date_to = min(date_to or last, last)
+    if staff_ids is None:
+        staff_ids = list(User.objects.filter(role="staff").values_list("id", flat=True))
+    staff_ids = list(staff_ids)
+    if not staff_ids or date_from > date_to:
+        return 0
+
+    rows = [
+        StaffDay(
+            staff_id=staff_id,
+            date=day,
+            start_time=start,
+            end_time=end,
+            is_day_off=start is None,
+        )
+        for (staff_id, day), (start, end) in resolve_hours(staff_ids, date_from, date_to).items()
+    ]
+    StaffDay.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["staff", "date"],
+        update_fields=["start_time", "end_time", "is_day_off"],
+    )
+    return len(rows)
+
+
+def refresh_salon_dates(dates):
+    """Пересчитать календарь всех мастеров на даты dates (выходные салона)
+    и сбросить кеш расписания этих дней"""
+    dates = sorted(set(dates))
+    if not dates:
+        return 0
+    staff_ids = list(User.objects.filter(role="staff").values_list("id", flat=True))
+    written = refresh(staff_ids, dates[0], dates[-1])
+    schedule_cache.invalidate_days({(staff_id, day) for staff_id in staff_ids for day in dates})
+    return written
+
+
+def purge_past():
+    """Удалить дни, ушедшие в прошлое"""
+    first, _ = horizon()
+    deleted, _ = StaffDay.objects.filter(date__lt=first).delete()
+    return deleted
+
+
+def load_hours(staff_ids, date_from, date_to):
+    """Рабочий интервал мастеров по дням: {(staff_id, date): (start_time, end_time)}.
+
+    Читает по одной строке StaffDay на мастера и день; дни, которых нет
+    в таблице (за горизонтом или ещё не построены), вычисляются из правил.
+    """
+    staff_ids = list(staff_ids)
+    hours = {
+        (row["staff_id"], row["date"]): (row["start_time"], row["end_time"])
+        for row in StaffDay.objects.filter(
+            staff_id__in=staff_ids, date__range=(date_from, date_to)
+        ).values("staff_id", "date", "start_time", "end_time")
+    }
+    missing = [
+        (staff_id, day)
+        for staff_id in staff_ids
+        for day in _daterange(date_from, date_to)
+        if (staff_id, day) not in hours
+    ]
+    if missing:
+        resolved = resolve_hours(
+            {staff_id for staff_id, _ in missing},
+            min(day for _, day in missing),
+            max(day for _, day in missing),
+        )
+        for pair in missing:
+            hours[pair] = resolved[pair]
+    return hours
@@ -1,3 +1,260 @@
+import tempfile
+from datetime import date, time, timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from bookings.testing import SalonFixture
+from users.models import User
+from . import availability, cache as schedule_cache, staff_days
+from .management.commands.import_closures import parse_csv, parse_ical
+from .models import SalonClosure, SpecialHours, StaffDay, WorkingHours
+
+
+class ScheduleCacheTests(SalonFixture, TestCase):
+    """Кеш расписания по дням: попадания, сброс и гонка чтения с записью"""
+
+    WORKING_HOURS = (time(10, 0), time(12, 0))
+
+    def load(self):
+        return availability.load_day_schedules([self.staff.pk], self.date, self.date)[
+            (self.staff.pk, self.date)
+        ]
+
+    def test_second_load_is_a_hit(self):
+        self.load()
+        with self.assertNumQueries(0):
+            self.load()
+        self.assertEqual(schedule_cache.stats()["hits"], 1)
+        self.assertEqual(schedule_cache.stats()["misses"], 1)
+
+    def test_booking_invalidates_its_day(self):
+        self.assertTrue(self.load().fits(10 * 60, 60))
+        self.make_booking(10)
+        self.assertFalse(self.load().fits(10 * 60, 60))
+
+    def test_working_hours_change_invalidates_all_days(self):
+        self.load()
+        hours = WorkingHours.objects.get(staff=self.staff)
+        hours.end_time = time(18, 0)
+        hours.save()
+        self.assertTrue(self.load().fits(16 * 60, 60))
+
+    def test_stale_schedule_is_not_written_after_invalidation(self):
+        pair = (self.staff.pk, self.date)
+        versions = schedule_cache.day_versions([pair])
+        stale = availability.load_from_db([self.staff.pk], self.date, self.date)
+
+        # День сбросили, пока запрос читал БД
+        schedule_cache.invalidate_days({pair})
+        schedule_cache.set_many(stale, versions)
+
+        self.assertEqual(schedule_cache.get_many(schedule_cache.day_versions([pair])), {})
+
+
+class DayScheduleBitmapTests(TestCase):
+    """Битовая карта даёт тот же результат, что и проверка по интервалам"""
+
+    DURATIONS = (5, 30, 45, 60, 90, 125)
+
+    def day(self, start, end, busy=()):
+        return availability.DaySchedule(
+            staff_id=1, date=date(2030, 1, 7), start=start, end=end, busy=list(busy)
+        )
+
+    def assertMatchesIntervals(self, schedule, step=availability.SLOT_STEP_MINUTES):
+        for duration in self.DURATIONS:
+            for start in range(0, 24 * 60, 1):
+                self.assertEqual(
+                    schedule.fits(start, duration),
+                    schedule.fits_intervals(start, duration),
+                    f"start={start}, duration={duration}",
+                )
+            expected = []
+            if schedule.is_working:
+                expected = [
+                    availability.from_minutes(minute)
+                    for minute in range(schedule.start, schedule.end - duration + 1, step)
+                    if schedule.fits_intervals(minute, duration)
+                ]
+            self.assertEqual(schedule.free_slots(duration, step=step), expected)
+
+    def test_busy_intervals_off_the_grid(self):
+        schedule = self.day(9 * 60, 18 * 60, [(12 * 60 + 7, 13 * 60 + 2), (15 * 60, 15 * 60 + 30)])
+        self.assertMatchesIntervals(schedule)
+        self.assertMatchesIntervals(schedule, step=5)
+        self.assertFalse(schedule.fits(12 * 60 + 5, 30))
+        self.assertTrue(schedule.fits(13 * 60 + 5, 30))
+
+    def test_working_day_starting_off_the_grid(self):
+        schedule = self.day(9 * 60 + 3, 18 * 60)
+        self.assertMatchesIntervals(schedule)
+        self.assertFalse(schedule.fits(9 * 60, 30))
+        self.assertTrue(schedule.fits(9 * 60 + 3, 30))
+        self.assertTrue(schedule.fits(9 * 60 + 5, 30))
+
+    def test_service_ending_at_closing_time(self):
+        schedule = self.day(9 * 60, 18 * 60)
+        self.assertMatchesIntervals(schedule)
+        self.assertTrue(schedule.fits(17 * 60, 60))
+        self.assertFalse(schedule.fits(17 * 60 + 5, 60))
+        self.assertEqual(schedule.free_slots(60)[-1], time(17, 0))
+
+    def test_zero_length_busy_interval(self):
+        schedule = self.day(9 * 60, 18 * 60, [(12 * 60, 12 * 60), (14 * 60 + 2, 14 * 60 + 2)])
+        self.assertMatchesIntervals(schedule)
+        self.assertTrue(schedule.fits(11 * 60 + 30, 60))
+
+    def test_day_without_hours(self):
+        schedule = self.day(None, None)
+        self.assertMatchesIntervals(schedule)
+        self.assertEqual(schedule.free_mask, 0)
+        self.assertEqual(schedule.free_slots(30), [])
+
+
+class StaffDayTests(TestCase):
+    """Календарь мастера по датам строится из правил на горизонт вперёд"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create(username="master", role=User.Roles.STAFF)
+        cls.today, cls.last = staff_days.horizon()
+        cls.weekday = cls.today + timedelta(days=1)
+        WorkingHours.objects.create(
+            staff=cls.staff,
+            day_of_week=cls.weekday.weekday(),
+            start_time=time(10, 0),
+            end_time=time(18, 0),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_working_hours_materialize_whole_horizon(self):
+        days = StaffDay.objects.filter(staff=self.staff)
+        self.assertEqual(self.last - self.today, timedelta(days=staff_days.HORIZON_DAYS - 1))
+        self.assertEqual(days.count(), staff_days.HORIZON_DAYS)
+        self.assertFalse(days.get(date=self.weekday).is_day_off)
+        self.assertTrue(days.get(date=self.weekday + timedelta(days=1)).is_day_off)
+
+    def test_resolve_hours_and_refresh_outside_horizon(self):
+        day_off = self.weekday + timedelta(days=1)
+        hours = staff_days.resolve_hours([self.staff.pk], self.weekday, day_off)
+        self.assertEqual(hours[(self.staff.pk, self.weekday)], (time(10, 0), time(18, 0)))
+        self.assertEqual(hours[(self.staff.pk, day_off)], (None, None))
+
+        beyond = self.last + timedelta(days=7 - (self.last - self.weekday).days % 7)
+        self.assertEqual(staff_days.refresh([self.staff.pk], beyond, beyond), 0)
+        self.assertFalse(StaffDay.objects.filter(date=beyond).exists())
+        # За горизонтом часы вычисляются из правил
+        self.assertEqual(
+            staff_days.load_hours([self.staff.pk], beyond, beyond)[(self.staff.pk, beyond)],
+            (time(10, 0), time(18, 0)),
+        )
+
+    def test_purge_past(self):
+        StaffDay.objects.create(staff=self.staff, date=self.today - timedelta(days=1), is_day_off=True)
+        self.assertEqual(staff_days.purge_past(), 1)
+
+    def test_deleting_staff_with_hours(self):
+        SpecialHours.objects.create(staff=self.staff, date=self.weekday, note="Отгул")
+        self.staff.delete()
+        self.assertFalse(StaffDay.objects.exists())
+        self.assertFalse(WorkingHours.objects.exists())
+
+
+class SalonClosureTests(SalonFixture, TestCase):
+    """Выходные салона: приоритет слоёв расписания и импорт из файлов"""
+
+    DAYS_AHEAD = 2
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, text):
+        path = Path(self.tmp.name) / name
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    def hours(self):
+        return staff_days.resolve_hours([self.staff.pk], self.date, self.date)[
+            (self.staff.pk, self.date)
+        ]
+
+    def test_closure_overrides_weekly_hours(self):
+        SalonClosure.objects.create(date=self.date, start_time=time(12, 0), end_time=time(20, 0))
+        self.assertEqual(self.hours(), (time(12, 0), time(18, 0)))
+
+        SalonClosure.objects.filter(date=self.date).update(start_time=None, end_time=None)
+        self.assertEqual(self.hours(), (None, None))
+
+    def test_special_hours_override_closure(self):
+        SalonClosure.objects.create(date=self.date)
+        SpecialHours.objects.create(
+            staff=self.staff, date=self.date, start_time=time(9, 0), end_time=time(13, 0)
+        )
+        self.assertEqual(self.hours(), (time(9, 0), time(13, 0)))
+
+        SpecialHours.objects.filter(staff=self.staff).update(start_time=None, end_time=None)
+        self.assertEqual(self.hours(), (None, None))
+
+    def test_parse_csv(self):
+        closures = parse_csv(self.write("closures.csv", (
+            "date,start_time,end_time,note\n"
+            "2030-01-01,,,Новый год\n"
+            "2030-03-07,10:00,15:00,Сокращённый день\n"
+        )))
+        self.assertEqual(
+            [(c.date, c.start_time, c.end_time, c.note) for c in closures],
+            [
+                (date(2030, 1, 1), None, None, "Новый год"),
+                (date(2030, 3, 7), time(10, 0), time(15, 0), "Сокращённый день"),
+            ],
+        )
+
+    def test_parse_ical(self):
+        closures = parse_ical(self.write("holidays.ics", (
+            "BEGIN:VCALENDAR\n"
+            "BEGIN:VEVENT\n"
+            "DTSTART;VALUE=DATE:20300101\n"
+            "DTEND;VALUE=DATE:20300103\n"
+            "SUMMARY:Новый год\\, каникулы\n"
+            "END:VEVENT\n"
+            "BEGIN:VEVENT\n"
+            "DTSTART:20300307T100000\n"
+            "DTEND:20300307T150000\n"
+            "SUMMARY:Сокращённый\n"
+            "  день\n"
+            "END:VEVENT\n"
+            "END:VCALENDAR\n"
+        )))
+        self.assertEqual(
+            sorted((c.date, c.start_time, c.end_time, c.note) for c in closures),
+            [
+                # DTEND события на весь день не включается
+                (date(2030, 1, 1), None, None, "Новый год, каникулы"),
+                (date(2030, 1, 2), None, None, "Новый год, каникулы"),
+                (date(2030, 3, 7), time(10, 0), time(15, 0), "Сокращённый день"),
+            ],
+        )
+
+    def test_dry_run_reports_conflicts_without_saving(self):
+        booking = self.make_booking(16)
+        path = self.write("closures.csv", (
+            f"date,start_time,end_time,note\n{self.date.isoformat()},10:00,15:00,\n"
+        ))
+        out = StringIO()
+        call_command("import_closures", path, "--dry-run", stdout=out)
+
+        self.assertIn(f"Конфликт: запись #{booking.pk}", out.getvalue())
+        self.assertFalse(SalonClosure.objects.exists())
+        self.assertFalse(StaffDay.objects.get(staff=self.staff, date=self.date).is_day_off)
+        self.assertEqual(
+            staff_days.load_hours([self.staff.pk], self.date, self.date)[(self.staff.pk, self.date)],
+            (time(10, 0), time(18, 0)),
+        )
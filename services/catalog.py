@@ -0,0 +1,126 @@
+"""Каталог услуг: версия и снимок в памяти процесса.
+
+Каталог (категории, услуги и мастера по специализациям) меняется редко,
+поэтому его представления кешируются с ключом, в который входит номер
+версии. Любое сохранение или удаление Service/ServiceCategory, а также
+изменение мастера увеличивает версию (см. services.signals), и старые
+записи кеша просто перестают читаться.
+
+Формы, страницы услуг и API читают каталог из snapshot(): он загружается
+тремя запросами и хранится в памяти процесса, пока версия в общем кеше
+не изменится.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import User
+from .models import Service, ServiceCategory
+
+
+VERSION_KEY = "services:catalog:version"
+CACHE_TIMEOUT = getattr(settings, "CATALOG_CACHE_TIMEOUT", 24 * 60 * 60)
+
+
+def version():
+    """Текущая версия каталога"""
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        # Версия по времени, чтобы после вытеснения ключа не прочитать старый каталог
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _bump():
+    cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def bump():
+    """Сделать устаревшим всё, что закешировано для текущей версии"""
+    _bump()
+    transaction.on_commit(_bump)
+
+
+class Snapshot:
+    """Каталог одной версии в памяти процесса.
+
+    Объекты моделей общие для всех запросов процесса, поэтому изменять
+    их нельзя - только читать и передавать в ForeignKey.
+    """
+
+    def __init__(self, version, categories, services, staff):
+        self.version = version
+        self.categories = categories
+        self.services = services
+        self.staff = staff
+        self.category_by_id = {category.pk: category for category in categories}
+        self.service_by_id = {service.pk: service for service in services}
+        self.service_by_slug = {service.slug: service for service in services if service.slug}
+        self.staff_by_id = {user.pk: user for user in staff}
+        self.staff_by_category = {}
+        for user in staff:
+            self.staff_by_category.setdefault(user.specialization_id, []).append(user)
+
+    @classmethod
+    def load(cls, version):
+        """Категории, услуги и мастера из БД (три запроса)"""
+        categories = list(ServiceCategory.objects.order_by("name"))
+        by_id = {category.pk: category for category in categories}
+        services = list(Service.objects.order_by("name"))
+        for service in services:
+            # Категория уже загружена - обращение к service.category без запроса
+            service.category = by_id[service.category_id]
+        staff = list(
+            User.objects.filter(role=User.Roles.STAFF)
+            .only("id", "username", "first_name", "last_name", "role", "specialization_id")
+            .order_by("first_name", "id")
+        )
+        return cls(version, categories, services, staff)
+
+    def service(self, pk, active_only=True):
+        """Услуга по id (подходит и строка из запроса) или None"""
+        try:
+            service = self.service_by_id.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+        if service is None or (active_only and not service.is_active):
+            return None
+        return service
+
+    def active_categories(self):
+        return [category for category in self.categories if category.is_active]
+
+    def active_services(self, category_id=None):
+        """Активные услуги по названию, при category_id - только этой категории"""
+        return [
+            service
+            for service in self.services
+            if service.is_active and (category_id is None or service.category_id == category_id)
+        ]
+
+    def staff_for(self, category_id=None):
+        """Мастера по имени, при category_id - только с этой специализацией"""
+        if category_id is None:
+            return self.staff
+        return self.staff_by_category.get(category_id, [])
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def snapshot():
+    """Каталог текущей версии; перечитывается из БД после bump()"""
+    global _snapshot
+    current = version()
+    loaded = _snapshot
+    if loaded is None or loaded.version != current:
+        with _snapshot_lock:
+            if _snapshot is None or _snapshot.version != current:
+                _snapshot = Snapshot.load(current)
+            loaded = _snapshot
+    return loaded
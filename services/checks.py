@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+# Кеши, которые не подходят для нескольких процессов и серверов
+LOCAL_CACHES = {
+    "LocMemCache": "он свой у каждого процесса, и изменения каталога и "
+    "расписания не дойдут до других воркеров",
+    "FileBasedCache": "он виден только на одной машине, вытесняет записи "
+    "случайно при переполнении, а add/incr в нём не атомарны между процессами",
+}
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Версии каталога и расписания должны быть видны всем процессам"""
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    reason = LOCAL_CACHES.get(backend.rsplit(".", 1)[-1])
+    if settings.DEBUG or reason is None:
+        return []
+    return [
+        Warning(
+            f"Кеш по умолчанию - {backend.rsplit('.', 1)[-1]}: {reason}.",
+            hint="Задайте общий кеш (Redis, Memcached) через CACHE_BACKEND/CACHE_LOCATION.",
+            id="services.W001",
+        )
+    ]
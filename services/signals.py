@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from . import catalog
+from .models import Service, ServiceCategory
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=ServiceCategory)
+def bump_catalog_version(sender, **kwargs):
+    """Каталог изменился - закешированные фрагменты больше не используются"""
+    catalog.bump()
+
+
+@receiver(post_save, sender="users.User")
+def bump_catalog_on_staff_save(sender, instance, **kwargs):
+    """Мастер добавлен, переименован или сменил специализацию"""
+    if instance.catalog_changed():
+        catalog.bump()
+
+
+@receiver(post_delete, sender="users.User")
+def bump_catalog_on_staff_delete(sender, instance, **kwargs):
+    if instance.role == instance.Roles.STAFF:
+        catalog.bump()
@@ -1,3 +1,83 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from bookings.testing import SalonFixture
+from users.models import User
+from . import catalog, checks
+from .models import Service
+
+
+class ServiceCatalogTests(SalonFixture, TestCase):
+    """Каталог услуг кешируется и обновляется при изменении услуг"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Service.objects.create(
+            category=cls.category, name="Старая услуга", duration_minutes=30, price=500,
+            is_active=False,
+        )
+
+    def test_only_active_services_are_fetched(self):
+        response = self.client.get(reverse("services:list"))
+
+        category = response.context["categories"][0]
+        self.assertEqual([s.name for s in category.active_services], ["Стрижка"])
+        self.assertNotContains(response, "Старая услуга")
+
+    def test_catalog_fragment_is_cached_until_change(self):
+        self.client.get(reverse("services:list"))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("services:list"))
+
+        Service.objects.create(
+            category=self.category, name="Укладка", duration_minutes=30, price=700
+        )
+        self.assertContains(self.client.get(reverse("services:list")), "Укладка")
+
+
+class CatalogSnapshotTests(SalonFixture, TestCase):
+    """Каталог в памяти процесса перечитывается только после изменения версии"""
+
+    def test_snapshot_is_reused_between_requests(self):
+        catalog.snapshot()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.service.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse("services:detail", kwargs={"slug": "net-takoi"})).status_code,
+            404,
+        )
+
+    def test_staff_changes_refresh_snapshot(self):
+        self.assertEqual(
+            [user.pk for user in catalog.snapshot().staff_for(self.category.pk)], [self.staff.pk]
+        )
+
+        staff = User.objects.get(pk=self.staff.pk)
+        staff.specialization = None
+        staff.save()
+        self.assertEqual(catalog.snapshot().staff_for(self.category.pk), [])
+
+        # Изменения клиентов каталог не затрагивают
+        current = catalog.version()
+        User.objects.create_user(username="client2", password="pass", role="client")
+        self.assertEqual(catalog.version(), current)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Проверка services.W001 предупреждает о кеше, который не общий для процессов"""
+
+    def check(self, backend, debug=False):
+        caches = {"default": {"BACKEND": f"django.core.cache.backends.{backend}"}}
+        with override_settings(DEBUG=debug, CACHES=caches):
+            return [warning.id for warning in checks.shared_cache_check(None)]
+
+    def test_process_local_caches_are_reported(self):
+        self.assertEqual(self.check("locmem.LocMemCache"), ["services.W001"])
+        self.assertEqual(self.check("filebased.FileBasedCache"), ["services.W001"])
+        self.assertEqual(self.check("filebased.FileBasedCache", debug=True), [])
+
+    def test_shared_caches_pass(self):
+        self.assertEqual(self.check("redis.RedisCache"), [])
+        self.assertEqual(self.check("db.DatabaseCache"), [])
@@ -1,49 +1,76 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.utils.decorators import method_decorator
-from django.views.decorators.http import require_POST
+from django.db.models import Prefetch
+from . import catalog
 from .models import ServiceCategory, Service
-from bookings.forms import BookingForm, ServiceBookingForm
-from bookings.models import Booking
+from bookings.forms import ServiceBookingForm
+from bookings import idempotency
+from bookings.services import BookingConflict, create_booking
 from datetime import datetime
 
 
 def service_list(request):
-    """Список всех услуг"""
+    """Список всех услуг.
+
+    Страница кешируется фрагментом с версией каталога, поэтому запросы
+    к БД выполняются только после изменения услуг или категорий.
+    """
     categories = ServiceCategory.objects.filter(is_active=True).prefetch_related(
-        "services"
+        Prefetch(
+            "services",
+            queryset=Service.objects.filter(is_active=True).order_by("name"),
+            to_attr="active_services",
+        )
     )
-    context = {"categories": categories}
+    context = {
+        "categories": categories,
+        "catalog_version": catalog.version(),
+        "catalog_timeout": catalog.CACHE_TIMEOUT,
+    }
     return render(request, "services/service_list.html", context)
 
 
 def service_detail(request, slug):
     """Детальная страница услуги с возможностью бронирования"""
-    service = get_object_or_404(Service, slug=slug, is_active=True)
+    service = catalog.snapshot().service_by_slug.get(slug)
+    if service is None or not service.is_active:
+        raise Http404("Услуга не найдена")
 
     # Форма бронирования с предварительно выбранной услугой
     if request.method == "POST":
+        # Повторная отправка той же формы - сразу возвращаем прежний результат
+        token = request.POST.get(idempotency.FIELD_NAME)
+        replay = idempotency.claim(request.user.pk, token)
+        if replay is not None:
+            return idempotency.replay_response(request, replay)
+
         form = ServiceBookingForm(request.POST, initial={'service': service.id})
-        if form.is_valid():
-            # Создаем booking с выбранной услугой
-            time_str = form.cleaned_data['appointment_time']
-            time_obj = datetime.strptime(time_str, "%H:%M").time()
-
-            booking = Booking(
-                client=request.user,
-                staff=form.cleaned_data['staff'],
-                service=service,  # Используем текущую услугу из URL
-                appointment_date=form.cleaned_data['appointment_date'],
-                appointment_time=time_obj
-            )
-            booking.save()
-            messages.success(request, f'Запись на "{service.name}" успешно создана!')
-            return redirect('bookings:my_bookings')
-        else:
-            # Отладка: выводим ошибки формы
-            print(f"Form errors: {form.errors}")
-            print(f"Non field errors: {form.non_field_errors()}")
+        try:
+            if form.is_valid():
+                # Создаем booking с выбранной услугой
+                time_str = form.cleaned_data['appointment_time']
+                time_obj = datetime.strptime(time_str, "%H:%M").time()
+
+                try:
+                    booking = create_booking(
+                        client=request.user,
+                        staff=form.cleaned_data['staff'],
+                        service=service,  # Используем текущую услугу из URL
+                        date=form.cleaned_data['appointment_date'],
+                        start_time=time_obj,
+                    )
+                except BookingConflict as conflict:
+                    form.add_error(None, str(conflict))
+                else:
+                    idempotency.complete(request.user.pk, token, booking)
+                    messages.success(request, f'Запись на "{service.name}" успешно создана!')
+                    return redirect('bookings:my_bookings')
+        except Exception:
+            # Иначе повторная отправка получала бы "уже обрабатывается"
+            idempotency.release(request.user.pk, token)
+            raise
+        idempotency.release(request.user.pk, token)
     else:
         form = ServiceBookingForm(initial={'service': service.id})
 
@@ -0,0 +1,157 @@
+"""Сводка личного кабинета клиента.
+
+Статистика считается двумя запросами независимо от числа записей:
+условные Count/Sum по действующим записям клиента с подзапросами для
+ближайшей записи и любимых мастера и услуги (их ранжирует БД по обеим
+таблицам) и такой же агрегат по архиву (bookings.archive). Результат
+кешируется на пользователя и сбрасывается при изменении его записей
+(см. users.signals).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from bookings.models import Booking, BookingArchive
+from services.models import Service
+from .models import User
+
+
+CACHE_TIMEOUT = getattr(settings, "PROFILE_CACHE_TIMEOUT", 10 * 60)
+
+# Статусы, при которых запись ещё предстоит
+ACTIVE_STATUSES = [Booking.Status.PENDING, Booking.Status.CONFIRMED]
+
+
+def _key(user_id):
+    return f"users:dashboard:{user_id}"
+
+
+def _by_status(prefix=""):
+    """Условные Count по статусам записей: {"count_<status>": Count}"""
+    return {
+        f"count_{status}": Count(f"{prefix}id", filter=Q(**{f"{prefix}status": status}))
+        for status in Booking.Status.values
+    }
+
+
+def _client_bookings(model, user_id):
+    """Неотменённые записи клиента в таблице model"""
+    return (
+        model.objects.filter(client_id=user_id)
+        .exclude(status=Booking.Status.CANCELLED)
+        .order_by()
+    )
+
+
+def _uses(model, field, user_id):
+    """Подзапрос: сколько записей клиента в таблице model у строки field"""
+    return Coalesce(
+        Subquery(
+            _client_bookings(model, user_id)
+            .filter(**{field: OuterRef("pk")})
+            .values(field)
+            .annotate(n=Count("id"))
+            .values("n")
+        ),
+        0,
+    )
+
+
+def _favourite(queryset, field, name, user_id):
+    """Подзапрос: поле name самого частого мастера или услуги среди записей
+    клиента, включая архивные (при равенстве - с меньшим id).
+
+    Клиент подставляется значением, а не OuterRef: SQLite не видит столбцы
+    внешнего запроса через два уровня вложенности в ORDER BY.
+    """
+    return Subquery(
+        queryset.filter(
+            Q(pk__in=_client_bookings(Booking, user_id).values(field))
+            | Q(pk__in=_client_bookings(BookingArchive, user_id).values(field))
+        )
+        .annotate(uses=_uses(Booking, field, user_id) + _uses(BookingArchive, field, user_id))
+        .order_by("-uses", "pk")
+        .values(name)[:1]
+    )
+
+
+def _next_booking(field, now):
+    """Подзапрос: поле field ближайшей предстоящей записи клиента"""
+    return Subquery(
+        Booking.objects.filter(client=OuterRef("pk"), status__in=ACTIVE_STATUSES)
+        .filter(
+            Q(appointment_date__gt=now.date())
+            | Q(appointment_date=now.date(), appointment_time__gt=now.time())
+        )
+        .order_by("appointment_date", "appointment_time")
+        .values(field)[:1]
+    )
+
+
+def compute(user_id):
+    """Статистика клиента по действующим и архивным записям"""
+    now = timezone.localtime(timezone.now())
+    by_status = _by_status("bookings__")
+    stats = (
+        User.objects.filter(pk=user_id)
+        .annotate(
+            total=Count("bookings"),
+            spent=Sum(
+                "bookings__service__price",
+                filter=Q(bookings__status=Booking.Status.COMPLETED),
+            ),
+            next_date=_next_booking("appointment_date", now),
+            next_time=_next_booking("appointment_time", now),
+            next_service=_next_booking("service__name", now),
+            next_staff=_next_booking("staff__first_name", now),
+            favourite_staff=_favourite(User.objects.all(), "staff_id", "first_name", user_id),
+            favourite_service=_favourite(Service.objects.all(), "service_id", "name", user_id),
+            **by_status,
+        )
+        .values(
+            "total", "spent", "next_date", "next_time", "next_service", "next_staff",
+            "favourite_staff", "favourite_service", *by_status,
+        )
+        .get()
+    )
+    # Давние записи перенесены в архив - добавляем их к итогам
+    archived = BookingArchive.objects.filter(client_id=user_id).aggregate(
+        total=Count("id"),
+        spent=Sum("service__price", filter=Q(status=Booking.Status.COMPLETED)),
+        **_by_status(),
+    )
+    for name, value in archived.items():
+        stats[name] = (stats[name] or 0) + (value or 0)
+    stats["by_status"] = [
+        (label, stats.pop(f"count_{status}")) for status, label in Booking.Status.choices
+    ]
+    return stats
+
+
+def _is_stale(stats):
+    """Ближайшая запись из кеша уже началась"""
+    if not stats["next_date"]:
+        return False
+    now = timezone.localtime(timezone.now())
+    return (stats["next_date"], stats["next_time"]) <= (now.date(), now.time())
+
+
+def client_stats(user_id):
+    """Статистика клиента из кеша (или одним запросом, если её там нет)"""
+    stats = cache.get(_key(user_id))
+    if stats is None or _is_stale(stats):
+        stats = compute(user_id)
+        cache.set(_key(user_id), stats, CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate(user_ids):
+    """Сбросить сводку сразу и ещё раз после фиксации транзакции, чтобы
+    параллельный запрос не закешировал данные до коммита"""
+    keys = [_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
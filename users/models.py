@@ -20,5 +20,28 @@ class User(AbstractUser):
         help_text="Категория услуг, в которой специализируется мастер"
     )
 
+    # Поля мастера, которые входят в каталог услуг (services.catalog)
+    CATALOG_FIELDS = ("role", "specialization_id", "username", "first_name", "last_name")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._catalog_original = {
+            name: instance.__dict__.get(name) for name in cls.CATALOG_FIELDS
+        }
+        return instance
+
+    def catalog_changed(self):
+        """Изменились ли данные мастера в каталоге с момента загрузки.
+
+        Заодно запоминает текущие значения, поэтому вызывается один раз
+        после сохранения.
+        """
+        original = getattr(self, "_catalog_original", None) or {}
+        current = {name: self.__dict__.get(name) for name in self.CATALOG_FIELDS}
+        self._catalog_original = current
+        was_staff = original.get("role") == self.Roles.STAFF
+        return (was_staff or self.role == self.Roles.STAFF) and original != current
+
     def __str__(self) -> str:
         return f"{self.username} ({self.get_role_display()})"
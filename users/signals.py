@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from bookings.models import Booking
+from bookings.signals import bookings_created, bookings_transitioned
+from . import dashboard
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def invalidate_client_dashboard(sender, instance, **kwargs):
+    """Запись клиента изменилась - сбрасываем сводку его кабинета"""
+    dashboard.invalidate([instance.client_id])
+
+
+@receiver(bookings_created)
+def invalidate_created_dashboards(sender, bookings, **kwargs):
+    dashboard.invalidate(booking.client_id for booking in bookings)
+
+
+@receiver(bookings_transitioned)
+def invalidate_transitioned_dashboards(sender, clients, **kwargs):
+    dashboard.invalidate(clients)
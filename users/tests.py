@@ -1,3 +1,77 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from bookings import archive
+from bookings.models import Booking
+from bookings.testing import SalonFixture
+from services.models import Service
+from .models import User
+from . import dashboard
+
+
+class ClientDashboardTests(SalonFixture, TestCase):
+    """Сводка личного кабинета считается фиксированным числом запросов и кешируется"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.haircut, cls.anna = cls.service, cls.staff
+        cls.styling = Service.objects.create(
+            category=cls.category, name="Укладка", duration_minutes=30, price=500
+        )
+        cls.olga = User.objects.create(username="olga", first_name="Ольга", role=User.Roles.STAFF)
+
+    def book(self, staff, service, days, status):
+        day = timezone.localdate() + timedelta(days=days)
+        return self.make_booking(10, status, day=day, staff=staff, service=service)
+
+    def test_stats_in_fixed_number_of_queries(self):
+        self.book(self.anna, self.haircut, -10, Booking.Status.COMPLETED)
+        self.book(self.anna, self.haircut, -5, Booking.Status.COMPLETED)
+        self.book(self.olga, self.styling, -3, Booking.Status.CANCELLED)
+        self.book(self.olga, self.styling, 2, Booking.Status.CONFIRMED)
+
+        # Действующие записи с любимыми мастером и услугой, архив
+        with self.assertNumQueries(2):
+            stats = dashboard.compute(self.client_user.pk)
+
+        self.assertEqual(stats["total"], 4)
+        self.assertEqual(stats["spent"], 2000)
+        self.assertEqual(stats["favourite_staff"], "Анна")
+        self.assertEqual(stats["favourite_service"], "Стрижка")
+        self.assertEqual(stats["next_service"], "Укладка")
+        self.assertIn(("Выполнено", 2), stats["by_status"])
+
+    def test_archived_bookings_are_counted(self):
+        for days in (-400, -390, -380):
+            self.book(self.olga, self.styling, days, Booking.Status.COMPLETED)
+        self.book(self.anna, self.haircut, -10, Booking.Status.COMPLETED)
+        self.book(self.anna, self.haircut, 3, Booking.Status.CONFIRMED)
+        before = dashboard.compute(self.client_user.pk)
+
+        self.assertEqual(archive.archive(cutoff=timezone.localdate() - timedelta(days=365)), 3)
+
+        stats = dashboard.client_stats(self.client_user.pk)
+        self.assertEqual(stats, before)
+        self.assertEqual(stats["total"], 5)
+        self.assertEqual(stats["spent"], 2500)
+        self.assertEqual(stats["favourite_staff"], "Ольга")
+        self.assertIn(("Выполнено", 4), stats["by_status"])
+
+    def test_cache_is_reset_on_booking_change(self):
+        booking = self.book(self.anna, self.haircut, 1, Booking.Status.PENDING)
+        dashboard.client_stats(self.client_user.pk)
+        with self.assertNumQueries(0):
+            dashboard.client_stats(self.client_user.pk)
+
+        Booking.objects.transition(Booking.objects.filter(pk=booking.pk), Booking.Status.CANCELLED)
+
+        stats = dashboard.client_stats(self.client_user.pk)
+        self.assertIsNone(stats["next_date"])
+        self.assertIn(("Отменено", 1), stats["by_status"])
 
-# Create your tests here.
+    def test_profile_requires_login(self):
+        response = self.client.get("/users/profile/")
+        self.assertEqual(response.status_code, 302)
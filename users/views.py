@@ -1,13 +1,16 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import login, logout
-from bookings.models import Booking
+from django.contrib.auth.decorators import login_required
+from . import dashboard
 from .forms import UserRegistrationForm
 
 
+@login_required
 def profile(request):
-    user_bookings = Booking.objects.filter(client=request.user)
-    return render(request, 'users/profile.html', {'bookings': user_bookings})
+    """Личный кабинет: сводка по записям клиента"""
+    stats = dashboard.client_stats(request.user.pk)
+    return render(request, 'users/profile.html', {'stats': stats})
 
 
 def register(request):